@@ -2,10 +2,12 @@ from django.contrib import admin
 
 # Register your models here.
 
-from .models import Status, Ticket, TicketPost, TicketType, Department
+from .models import Status, Ticket, TicketPost, TicketType, Department, BackgroundTask, NotificationOutbox
 
 admin.site.register(Status)
 admin.site.register(Ticket)
 admin.site.register(TicketPost)
 admin.site.register(TicketType)
-admin.site.register(Department)
\ No newline at end of file
+admin.site.register(Department)
+admin.site.register(BackgroundTask)
+admin.site.register(NotificationOutbox)
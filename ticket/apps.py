@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class TicketConfig(AppConfig):
@@ -7,3 +8,8 @@ class TicketConfig(AppConfig):
 
     def ready(self):
         import ticket.signals  # Import the signals module
+        import ticket.notifications  # Register the background tasks
+
+        if getattr(settings, "SENTIMENT_PRELOAD", False):
+            from . import sentiment
+            sentiment.preload()
@@ -0,0 +1,113 @@
+"""
+Bulk ticket operations for triage: assign, transfer, change status,
+follow and unfollow many tickets at once.
+
+Each operation runs in one transaction: field changes go through
+services.update_tickets (one conditional UPDATE), follow changes use
+bulk_create()/delete() on the followers through table. Those bypass model
+signals, so follower counters and caches are maintained here. Assign,
+transfer and status changes queue one batched notification per affected
+recipient instead of one email per ticket.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import dashboard, notifications, services
+from .models import Ticket
+
+ACTIONS = ("assign", "transfer", "status", "follow", "unfollow")
+
+
+class BulkActionError(ValueError):
+    pass
+
+
+def max_tickets():
+    return getattr(settings, "BULK_MAX_TICKETS", 500)
+
+
+def apply(actor, action, ticket_ids, target=None):
+    """
+    Apply ``action`` to the tickets in ``ticket_ids`` on behalf of ``actor``
+    and return the ids that actually changed. ``target`` is the User,
+    Department or Status for assign/transfer/status (assign defaults to
+    ``actor``).
+    """
+    if action not in ACTIONS:
+        raise BulkActionError(f"Unknown bulk action: {action}")
+    try:
+        ticket_ids = {int(pk) for pk in ticket_ids}
+    except (TypeError, ValueError):
+        raise BulkActionError("Ticket ids must be integers.")
+    if not ticket_ids:
+        raise BulkActionError("Select at least one ticket.")
+    if len(ticket_ids) > max_tickets():
+        raise BulkActionError(f"At most {max_tickets()} tickets can be updated at once.")
+    if action == "assign" and target is None:
+        target = actor
+    if action in ("transfer", "status") and target is None:
+        raise BulkActionError(f"The {action} action needs a target.")
+
+    with transaction.atomic():
+        tickets = Ticket.objects.filter(pk__in=ticket_ids)
+        if action == "follow":
+            return _follow(actor, tickets)
+        if action == "unfollow":
+            return _unfollow(actor, tickets)
+        return _update(actor, action, ticket_ids, target)
+
+
+def _update(actor, action, ticket_ids, target):
+    field, summary = {
+        "assign": ("assigned", f"Assigned to {getattr(target, 'username', '')}"),
+        "transfer": ("department", f"Transferred to {target}"),
+        "status": ("status", f"Status changed to {target}"),
+    }[action]
+
+    # Rows already holding the target value are neither written nor notified.
+    changed = services.update_tickets(ticket_ids, field, target)
+    if not changed:
+        return changed
+
+    recipients = notifications.resolve_recipients_many(changed)
+    notifications.queue_batch(
+        f"{summary} by {actor.username}",
+        {
+            ticket_id: [email for user_id, email in found.items() if user_id != actor.pk]
+            for ticket_id, found in recipients.items()
+        },
+    )
+    return changed
+
+
+def _follow(actor, tickets):
+    Followers = Ticket.followers.through
+    ids = set(tickets.values_list("pk", flat=True))
+    already = set(Followers.objects.filter(
+        user=actor, ticket_id__in=ids).values_list("ticket_id", flat=True))
+    changed = sorted(ids - already)
+    Followers.objects.bulk_create(
+        [Followers(ticket_id=pk, user_id=actor.pk) for pk in changed],
+        ignore_conflicts=True,
+    )
+    _followers_changed(actor, changed)
+    return changed
+
+
+def _unfollow(actor, tickets):
+    Followers = Ticket.followers.through
+    following = Followers.objects.filter(user=actor, ticket__in=tickets)
+    changed = sorted(following.values_list("ticket_id", flat=True))
+    following.delete()
+    _followers_changed(actor, changed)
+    return changed
+
+
+def _followers_changed(actor, ticket_ids):
+    if not ticket_ids:
+        return
+    # Recounted rather than adjusted by len(ticket_ids): a concurrent
+    # follow makes bulk_create skip its row, an unfollow empties a delete.
+    Ticket.objects.filter(pk__in=ticket_ids).recount()
+    notifications.invalidate_recipients(*ticket_ids)
+    dashboard.invalidate(actor.pk)
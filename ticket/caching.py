@@ -0,0 +1,24 @@
+"""
+Caches that writes invalidate (notification recipients, tab counts).
+
+Each lives under a configurable alias. With several processes the alias
+must name a cache they all share: an invalidation only reaches the backend
+it is sent to. Deletes wait for the surrounding transaction to commit;
+issued inside it, a concurrent request could cache the old, still committed
+rows again before the change commits.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def cache_for(alias_setting):
+    """The cache named by the ``alias_setting`` setting, ``default`` when unset."""
+    return caches[getattr(settings, alias_setting, "default")]
+
+
+def delete_on_commit(alias_setting, keys):
+    """Delete ``keys`` from that cache once the current transaction commits."""
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: cache_for(alias_setting).delete_many(keys))
@@ -0,0 +1,79 @@
+"""
+Conditional GET (ETag) for ticket pages and API endpoints.
+
+Validators come from a narrow probe of the columns that change whenever a
+rendered ticket does: ``updated``, the denormalized post/follower counters
+and ``sentiment`` (which is stored without touching ``updated``), the
+creator's and assignee's usernames, the latest post edit, plus the
+reference-data version for renamed statuses and departments. A request
+whose ETag still matches is answered with 304 after that one indexed
+query, before anything is loaded, rendered or serialized.
+
+Only an ETag is sent, no Last-Modified: follower changes, sentiment,
+reference-data renames and deleted rows change a representation without
+moving any timestamp, so an If-Modified-Since check would answer 304 with
+a stale copy.
+"""
+import hashlib
+
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import refdata
+from .models import Ticket, TicketPost
+
+PROBE_FIELDS = ("id", "updated", "post_count", "last_post_at", "follower_count", "sentiment",
+                "created_by__username", "assigned__username", "post_edited")
+
+
+def with_probe(queryset):
+    """
+    ``queryset`` annotated with ``post_edited``, the newest post ``updated``:
+    editing a post's message, privacy or upload does not touch the ticket.
+    """
+    return queryset.annotate(post_edited=Subquery(
+        TicketPost.objects.filter(ticket=OuterRef("pk"))
+        .order_by("-updated").values("updated")[:1]))
+
+
+def probe_ticket(ticket_id):
+    """Probe row for one ticket, or None when it does not exist."""
+    if not str(ticket_id).isdigit():
+        return None
+    return with_probe(Ticket.objects.filter(pk=ticket_id)).values(*PROBE_FIELDS).first()
+
+
+async def aprobe_ticket(ticket_id):
+    """``probe_ticket()`` for async views."""
+    if not str(ticket_id).isdigit():
+        return None
+    return await with_probe(Ticket.objects.filter(pk=ticket_id)).values(*PROBE_FIELDS).afirst()
+
+
+def etag(rows, *scope):
+    """
+    ETag for probe ``rows``. ``scope`` adds whatever else the
+    representation depends on (user, renderer, ...).
+    """
+    digest = hashlib.sha1(repr((
+        refdata.current_version(),
+        scope,
+        [tuple(row[field] for field in PROBE_FIELDS) for row in rows],
+    )).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified(request, etag):
+    """A 304 response when the client's cached copy is still current, else None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_etag(response, etag)
+    return response
+
+
+def set_etag(response, etag):
+    response["ETag"] = etag
+    # Let clients keep a copy but revalidate it on every use.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,36 @@
+"""
+Per-user tab badge counts for the "my tickets" page.
+
+Counts live in the DASHBOARD_CACHE_ALIAS cache keyed by user id and are
+invalidated from ticket.signals whenever a user's created, assigned or
+followed tickets change; a miss falls back to TicketQuerySet.tab_counts
+(one query).
+"""
+from django.conf import settings
+
+from . import caching
+from .models import Ticket
+
+
+def counts_cache():
+    return caching.cache_for("DASHBOARD_CACHE_ALIAS")
+
+
+def cache_key(user_id):
+    return f"user:{user_id}:tab_counts"
+
+
+def tab_counts(user):
+    cache = counts_cache()
+    key = cache_key(user.pk)
+    counts = cache.get(key)
+    if counts is None:
+        counts = Ticket.objects.tab_counts(user)
+        cache.set(key, counts, getattr(settings, "DASHBOARD_COUNTS_TTL", 300))
+    return counts
+
+
+def invalidate(*user_ids):
+    """Drop the users' cached counts once the current transaction commits."""
+    caching.delete_on_commit(
+        "DASHBOARD_CACHE_ALIAS", [cache_key(pk) for pk in set(user_ids) if pk is not None])
@@ -1,13 +1,40 @@
 import django_filters
+from functools import partial
 from django.contrib.auth.models import User
 from django import forms
+from django.db.models import Case, FloatField, Value, When
+from django.urls import reverse_lazy
 from .models import Ticket, Status, Department, TicketType
+from . import refdata, search
 
 
 def get_select_widget():
     return forms.Select(attrs={'class': 'form-select'})
 
 
+class UserSelect(forms.Select):
+    """
+    Select for a user filter that only renders the selected user. The page
+    fills in other users from the ``user_search`` typeahead endpoint, so the
+    dashboard never loads the whole user table.
+    """
+
+    def __init__(self, attrs=None):
+        super().__init__({"data-user-search-url": reverse_lazy("user_search"), **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        ids = [v for v in value if str(v).isdigit()]
+        field = getattr(choices, "field", None)
+        self.choices = [("", getattr(field, "empty_label", None) or "---------")]
+        if ids:
+            self.choices += list(User.objects.filter(pk__in=ids).values_list("pk", "username"))
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+
 class TicketFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(
         lookup_expr='icontains',
@@ -18,8 +45,17 @@ class TicketFilter(django_filters.FilterSet):
         })
     )
 
-    status = django_filters.ModelChoiceFilter(
-        queryset=Status.objects.all(),
+    q = django_filters.CharFilter(
+        method='filter_search',
+        label='Search',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Search titles and messages...'
+        })
+    )
+
+    status = django_filters.ChoiceFilter(
+        choices=partial(refdata.choices, Status),
         empty_label="All Statuses",
         label='Status'
     )
@@ -30,28 +66,31 @@ class TicketFilter(django_filters.FilterSet):
         label='Priority'
     )
 
-    department = django_filters.ModelChoiceFilter(
-        queryset=Department.objects.all(),
+    department = django_filters.ChoiceFilter(
+        choices=partial(refdata.choices, Department),
         empty_label="All Departments",
         label='Department'
     )
 
-    type = django_filters.ModelChoiceFilter(
-        queryset=TicketType.objects.all(),
+    type = django_filters.ChoiceFilter(
+        choices=partial(refdata.choices, TicketType),
         empty_label="All Types",
         label='Type'
     )
 
+    # Validated by primary key only; see UserSelect for rendering.
     created_by = django_filters.ModelChoiceFilter(
-        queryset=User.objects.all(),
+        queryset=User.objects.only("id"),
         empty_label="All Creators",
-        label='Created By'
+        label='Created By',
+        widget=UserSelect
     )
 
     assigned = django_filters.ModelChoiceFilter(
-        queryset=User.objects.all(),
+        queryset=User.objects.only("id"),
         empty_label="All Assignees",
-        label='Assigned To'
+        label='Assigned To',
+        widget=UserSelect
     )
 
     sentiment = django_filters.ChoiceFilter(
@@ -86,12 +125,26 @@ class TicketFilter(django_filters.FilterSet):
         label="Sort by"
     )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, data=None, queryset=None, **kwargs):
+        if queryset is None:
+            queryset = Ticket.objects.for_list()
+        super().__init__(data, queryset, **kwargs)
         for field in self.form.fields.values():
             if isinstance(field.widget, forms.Select):
                 field.widget.attrs.update({'class': 'form-select'})
 
+    def filter_search(self, queryset, name, value):
+        """Restrict to full-text matches, best ranked first."""
+        ranked = search.search(value)
+        if not ranked:
+            return queryset.none()
+        rank = Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in ranked],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=[pk for pk, _ in ranked]).annotate(
+            search_rank=rank).order_by("-search_rank", "-updated", "-id")
+
     class Meta:
         model = Ticket
         fields = ["title", "status", "priority", "department",
@@ -0,0 +1,198 @@
+"""
+Request instrumentation: per-request timing collection, a process-local
+metrics registry and the Prometheus text exposition served at /metrics.
+
+Request-level figures (query count, DB time, template time, spans) are only
+collected for the sampled fraction of requests chosen by
+InstrumentationMiddleware. Spans reported through ``ticket.metrics`` are
+aggregated for every request and for background workers.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar("ticket_request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.spans = defaultdict(float)
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+class Registry:
+    """Thread-safe counters and histograms rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, dict(value, buckets=list(value["buckets"])))
+                for key, value in self._histograms.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+def record_span(name, seconds, labels):
+    """``ticket.metrics`` hook: aggregate spans and attach them to the current request."""
+    registry.observe("ticket_span_duration_seconds", {"span": name}, seconds)
+    timings = current()
+    if timings is not None:
+        timings.spans[name] += seconds
+
+
+def record_request(view, method, status, timings):
+    labels = {"view": view, "method": method}
+    registry.inc("ticket_requests_total", dict(labels, status=str(status)))
+    registry.observe("ticket_request_duration_seconds", labels, timings.elapsed)
+    registry.observe("ticket_request_db_duration_seconds", labels, timings.db_seconds)
+    registry.observe("ticket_request_template_duration_seconds", labels,
+                     timings.template_seconds)
+    registry.inc("ticket_request_queries_total", labels, timings.queries)
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = current()
+        if timings is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.template_seconds += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to sampled requests."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+def metrics_allowed(request):
+    """
+    Scrapers from INSTRUMENTATION_METRICS_ALLOWED_IPS (loopback by default)
+    and logged-in staff may read /metrics; everyone else is refused.
+    """
+    allowed = getattr(settings, "INSTRUMENTATION_METRICS_ALLOWED_IPS", ("127.0.0.1", "::1"))
+    if request.META.get("REMOTE_ADDR") in allowed:
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    # Request metrics only cover sampled requests; publish the rate so
+    # dashboards can scale the counters back up.
+    sample_rate = getattr(settings, "INSTRUMENTATION_SAMPLE_RATE", 0.1)
+    body = registry.render() + (
+        "# TYPE ticket_instrumentation_sample_rate gauge\n"
+        f"ticket_instrumentation_sample_rate {sample_rate:g}\n"
+    )
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+
+from ticket.models import Ticket, TicketPost
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    from ticket import sentiment
+
+    # Each worker process loads its own VADER instance once.
+    sentiment.get_analyzer()
+
+
+def _score_chunk(rows):
+    from ticket import sentiment
+
+    analyzer = sentiment.get_analyzer()
+    return [
+        (pk, sentiment.classify(analyzer.polarity_scores(message)["compound"]))
+        for pk, message in rows
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Recompute Ticket.sentiment from each ticket's first post using a "
+            "process pool. Progress is checkpointed so interrupted runs resume.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--chunk-size", type=int, default=2000,
+                            help="Rows fetched per database round trip and per pool task")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Rows per bulk_update statement")
+        parser.add_argument("--only-missing", action="store_true",
+                            help="Skip tickets that already have a sentiment")
+        parser.add_argument("--checkpoint", default=".backfill_sentiment.checkpoint",
+                            help="File recording the last processed ticket id")
+        parser.add_argument("--reset", action="store_true",
+                            help="Ignore an existing checkpoint and start over")
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"]
+        start_after = 0 if options["reset"] else self.read_checkpoint(checkpoint)
+        if start_after:
+            self.stdout.write(f"Resuming after ticket #{start_after}")
+
+        first_message = TicketPost.objects.filter(
+            ticket=OuterRef("pk")).order_by("created", "id").values("message")[:1]
+        tickets = Ticket.objects.filter(pk__gt=start_after)
+        if options["only_missing"]:
+            tickets = tickets.filter(sentiment__isnull=True)
+        rows = (
+            tickets.order_by("pk")
+            .annotate(first_message=Subquery(first_message))
+            .filter(first_message__isnull=False)
+            .values_list("pk", "first_message")
+            .iterator(chunk_size=options["chunk_size"])
+        )
+
+        processed = 0
+        started = time.perf_counter()
+        chunks = iter(lambda: list(islice(rows, options["chunk_size"])), [])
+        with multiprocessing.Pool(options["processes"], initializer=_init_worker) as pool:
+            for results in pool.imap(_score_chunk, chunks):
+                Ticket.objects.bulk_update(
+                    [Ticket(pk=pk, sentiment=label) for pk, label in results],
+                    ["sentiment"],
+                    batch_size=options["batch_size"],
+                )
+                processed += len(results)
+                self.write_checkpoint(checkpoint, results[-1][0])
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{processed} tickets scored, {processed / elapsed:.0f} tickets/sec")
+
+        connection.close()
+        elapsed = time.perf_counter() - started
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {processed} tickets in {elapsed:.1f}s "
+            f"({processed / max(elapsed, 1e-9):.0f} tickets/sec)"))
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def write_checkpoint(self, path, ticket_id):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(ticket_id))
+        os.replace(tmp_path, path)
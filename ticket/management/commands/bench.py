@@ -0,0 +1,167 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ticket.models import Ticket, TicketPost
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the HTML and REST hot paths against the current database "
+            "(see seed_load). Reports p50/p95 latency, queries per request and "
+            "response bytes, and can compare against a saved baseline. Writes "
+            "made by the benchmark are rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=20,
+                            help="Measured requests per scenario")
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--username",
+                            help="Run as this user (default: the busiest assignee)")
+        parser.add_argument("--only", nargs="*", default=None,
+                            help="Only run scenarios whose name contains one of these")
+        parser.add_argument("--save", metavar="PATH",
+                            help="Write results to PATH as a JSON baseline")
+        parser.add_argument("--compare", metavar="PATH",
+                            help="Compare results with a baseline saved by --save")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Allowed p95 / query-count regression ratio")
+
+    def handle(self, *args, **options):
+        if not Ticket.objects.exists():
+            raise CommandError("No tickets found; run `manage.py seed_load` first.")
+
+        user = self.pick_user(options["username"])
+        scenarios = self.scenarios(user)
+        if options["only"]:
+            scenarios = [s for s in scenarios
+                         if any(word in s[0] for word in options["only"])]
+
+        client = Client()
+        client.force_login(user)
+        results = {}
+        with override_settings(ALLOWED_HOSTS=["*"]), transaction.atomic():
+            for name, method, url, data in scenarios:
+                results[name] = self.run(client, method, url, data, options)
+                self.stdout.write(self.format_row(name, results[name]))
+            transaction.set_rollback(True)
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if options["compare"]:
+            self.compare(results, options["compare"], options["threshold"])
+
+    def pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username!r} does not exist.")
+        row = (Ticket.objects.exclude(assigned__isnull=True).order_by()
+               .values("assigned").annotate(n=Count("pk")).order_by("-n").first())
+        if row:
+            return User.objects.get(pk=row["assigned"])
+        return Ticket.objects.exclude(created_by__isnull=True).first().created_by
+
+    def scenarios(self, user):
+        sample = Ticket.objects.order_by("-updated", "-id").values(
+            "status", "department").first()
+        long_thread = (TicketPost.objects.order_by().values("ticket")
+                       .annotate(n=Count("pk")).order_by("-n").first())
+        ticket_id = long_thread["ticket"] if long_thread else Ticket.objects.first().pk
+        first_word = (Ticket.objects.values_list("title", flat=True).first()
+                      or "ticket").split()[0]
+        index = reverse("index")
+        my_tickets = reverse("my_tickets")
+        return [
+            ("html index", "get", index, {}),
+            ("html index status", "get", index, {"status": sample["status"] or ""}),
+            ("html index department", "get", index,
+             {"department": sample["department"] or ""}),
+            ("html index search", "get", index, {"q": first_word}),
+            ("html index sort priority", "get", index,
+             {"sort": "priority", "order": "asc"}),
+            ("html my_tickets created", "get", my_tickets, {"filter": "created"}),
+            ("html my_tickets assigned", "get", my_tickets, {"filter": "assigned"}),
+            ("html my_tickets followed", "get", my_tickets, {"filter": "followed"}),
+            ("html view_ticket long thread", "get",
+             reverse("view_ticket", args=[ticket_id]), {}),
+            ("html create_ticket", "post", reverse("create_ticket"), {
+                "title": "Benchmark ticket", "priority": 2,
+                "department": sample["department"] or "",
+                "message": "Created by manage.py bench",
+            }),
+            ("api list", "get", "/api/tickets/", {}),
+            ("api retrieve long thread", "get", f"/api/tickets/{ticket_id}/", {}),
+            ("api add_post", "post", f"/api/tickets/{ticket_id}/add_post/",
+             {"message": "Benchmark reply"}),
+        ]
+
+    def run(self, client, method, url, data, options):
+        request = getattr(client, method)
+        for _ in range(options["warmup"]):
+            request(url, data)
+
+        timings, queries, sizes, statuses = [], [], [], set()
+        for _ in range(options["runs"]):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request(url, data)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+            sizes.append(len(response.content))
+            statuses.add(response.status_code)
+
+        return {
+            "p50_ms": round(self.percentile(timings, 50), 2),
+            "p95_ms": round(self.percentile(timings, 95), 2),
+            "queries": max(queries),
+            "bytes": max(sizes),
+            "status": sorted(statuses),
+        }
+
+    def percentile(self, values, pct):
+        if len(values) < 2:
+            return values[0] if values else 0.0
+        return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+    def format_row(self, name, result):
+        return (f"{name:<32}{result['p50_ms']:>9.1f}ms{result['p95_ms']:>9.1f}ms"
+                f"{result['queries']:>6}q{result['bytes']:>10}B  {result['status']}")
+
+    def compare(self, results, path, threshold):
+        with open(path) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        self.stdout.write(f"\nCompared with {path}:")
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f"{name:<32} (new)")
+                continue
+            line = (f"{name:<32}p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f}ms, "
+                    f"queries {before['queries']} -> {result['queries']}, "
+                    f"bytes {before['bytes']} -> {result['bytes']}")
+            slower = result["p95_ms"] > before["p95_ms"] * (1 + threshold)
+            more_queries = result["queries"] > before["queries"]
+            if slower or more_queries:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} scenario(s) regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("No regressions"))
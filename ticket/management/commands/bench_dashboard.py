@@ -0,0 +1,62 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template import base
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from ticket.models import Ticket
+
+
+class Command(BaseCommand):
+    help = ("Render the ticket dashboard with many active users and report "
+            "response bytes and template render time. Seed data is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--tickets", type=int, default=10)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        render_times = []
+        original_render = base.Template.render
+
+        def timed_render(template, context):
+            start = time.perf_counter()
+            try:
+                return original_render(template, context)
+            finally:
+                if template.name == "ticket/index.html":
+                    render_times.append(time.perf_counter() - start)
+
+        with override_settings(ALLOWED_HOSTS=["*"]), transaction.atomic():
+            users = User.objects.bulk_create(
+                [User(username=f"bench-dashboard-{i:06d}")
+                 for i in range(options["users"])],
+                batch_size=1000,
+            )
+            Ticket.objects.bulk_create(
+                [Ticket(title=f"Dashboard ticket {i}", created_by=users[0])
+                 for i in range(options["tickets"])])
+
+            client = Client()
+            client.force_login(users[0])
+            client.get(reverse("index"))  # warm up
+
+            sizes = []
+            with mock.patch.object(base.Template, "render", timed_render):
+                for _ in range(options["runs"]):
+                    response = client.get(reverse("index"))
+                    sizes.append(len(response.content))
+            transaction.set_rollback(True)
+
+        render_times.sort()
+        self.stdout.write(
+            f"{options['users']} users, {options['tickets']} tickets per page")
+        self.stdout.write(f"rendered bytes: {max(sizes)}")
+        self.stdout.write(
+            f"template render: median {render_times[len(render_times) // 2] * 1000:.1f}ms, "
+            f"max {render_times[-1] * 1000:.1f}ms")
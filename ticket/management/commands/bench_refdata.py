@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ticket import refdata
+from ticket.models import Department, Status, Ticket, TicketType
+
+
+class Command(BaseCommand):
+    help = ("Count queries per request for pages that read Status, Department "
+            "and TicketType, with the reference-data cache off and on. "
+            "Seed data is rolled back.")
+
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=["*"]), transaction.atomic():
+            ticket = self.seed()
+            pages = [
+                ("index", "get", reverse("index"), {}),
+                ("create_ticket (GET)", "get", reverse("create_ticket"), {}),
+                ("view_ticket", "get", reverse("view_ticket", args=[ticket.pk]), {}),
+                ("api create ticket", "post", "/api/tickets/", {
+                    "title": "Benchmark", "priority": 2,
+                    "department": ticket.department_id, "type": ticket.type_id,
+                }),
+            ]
+            client = Client()
+            client.force_login(self.user)
+
+            results = []
+            for name, method, url, data in pages:
+                counts = []
+                for enabled in (False, True):
+                    with override_settings(REFDATA_CACHE_ENABLED=enabled):
+                        refdata.invalidate()
+                        getattr(client, method)(url, data)  # warm up
+                        with CaptureQueriesContext(connection) as queries:
+                            getattr(client, method)(url, data)
+                        counts.append(len(queries))
+                results.append((name, *counts))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'request':<24}{'uncached':>10}{'cached':>10}")
+        for name, before, after in results:
+            self.stdout.write(f"{name:<24}{before:>10}{after:>10}")
+
+    def seed(self):
+        self.user = User.objects.create(username="bench-refdata")
+        for name in ("Open", "In Progress", "Closed"):
+            Status.objects.get_or_create(status=name)
+        department = Department.objects.create(
+            department="Benchmark", desciption="Benchmark department")
+        ticket_type = TicketType.objects.create(
+            type="Benchmark", desciption="Benchmark type")
+        return Ticket.objects.create(
+            title="Benchmark ticket", created_by=self.user,
+            department=department, type=ticket_type,
+            status=refdata.get_status("Open"))
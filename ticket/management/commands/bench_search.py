@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ticket import search
+from ticket.models import Ticket, TicketPost
+
+WORDS = (
+    "printer network password login email outlook vpn laptop monitor keyboard "
+    "invoice payment refund order shipping delivery account access server "
+    "database backup restore crash error slow timeout update install license"
+).split()
+
+
+class Command(BaseCommand):
+    help = ("Seed posts, build the search index and compare full-text search "
+            "latency with an icontains scan. Seed data is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument("--posts-per-ticket", type=int, default=10)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            self.seed(rng, options["posts"], options["posts_per_ticket"])
+            started = time.perf_counter()
+            search.rebuild()
+            self.stdout.write(
+                f"Indexed {options['posts']} posts in {time.perf_counter() - started:.1f}s "
+                f"({connection.vendor})")
+
+            terms = [" ".join(rng.sample(WORDS, rng.randint(1, 2)))
+                     for _ in range(options["queries"])]
+            indexed = self.time_queries(search.get_backend(), terms)
+            scan = self.time_queries(search.FallbackBackend(), terms)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'backend':<12}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, timings in (("indexed", indexed), ("icontains", scan)):
+            self.stdout.write(
+                f"{name:<12}{self.percentile(timings, 50):>10.2f}"
+                f"{self.percentile(timings, 95):>10.2f}")
+
+    def seed(self, rng, posts, per_ticket):
+        user = User.objects.create(username="bench-search")
+        tickets = Ticket.objects.bulk_create(
+            [Ticket(title=" ".join(rng.choices(WORDS, k=4)), created_by=user)
+             for _ in range(max(posts // per_ticket, 1))],
+            batch_size=1000,
+        )
+        batch = []
+        for i in range(posts):
+            batch.append(TicketPost(
+                ticket=tickets[i % len(tickets)], user=user,
+                message=" ".join(rng.choices(WORDS, k=20))))
+            if len(batch) >= 5000:
+                TicketPost.objects.bulk_create(batch)
+                batch = []
+        TicketPost.objects.bulk_create(batch)
+        Ticket.objects.filter(created_by=user).recount()
+
+    def time_queries(self, backend, terms):
+        timings = []
+        for term in terms:
+            with connection.cursor() as cursor:
+                start = time.perf_counter()
+                backend.search(cursor, term, 25)
+                timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def percentile(self, values, pct):
+        if len(values) < 2:
+            return values[0] if values else 0.0
+        return statistics.quantiles(values, n=100)[pct - 1]
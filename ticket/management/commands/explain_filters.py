@@ -0,0 +1,75 @@
+from itertools import combinations
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from ticket.filters import TicketFilter
+from ticket.models import Ticket, TicketPost
+
+# TicketFilter parameters that translate to an equality lookup on Ticket.
+EQUALITY_FILTERS = {
+    "status": "status_id",
+    "priority": "priority",
+    "department": "department_id",
+    "type": "type_id",
+    "created_by": "created_by_id",
+    "assigned": "assigned_id",
+    "sentiment": "sentiment",
+}
+
+
+class Command(BaseCommand):
+    help = ("Print the database query plan for the dashboard query under each "
+            "TicketFilter combination, plus the per-ticket post thread query.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-combination", type=int, default=2,
+                            help="Largest number of filters combined in one query")
+        parser.add_argument("--analyze", action="store_true",
+                            help="Run EXPLAIN ANALYZE (PostgreSQL only)")
+        parser.add_argument("--title", default="",
+                            help="Also apply the title search with this value")
+
+    def handle(self, *args, **options):
+        sample = self.sample_values()
+        missing = sorted(set(EQUALITY_FILTERS) - set(sample))
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"No data for {', '.join(missing)}; those filters are skipped"))
+
+        explain_options = {}
+        if options["analyze"] and connection.vendor == "postgresql":
+            explain_options = {"analyze": True, "buffers": True}
+
+        names = sorted(sample)
+        for size in range(0, options["max_combination"] + 1):
+            for combo in combinations(names, size):
+                params = {name: sample[name] for name in combo}
+                if options["title"]:
+                    params["title"] = options["title"]
+                queryset = TicketFilter(params).qs[:10]
+                label = ", ".join(f"{k}={v}" for k, v in params.items()) or "(no filters)"
+                self.print_plan(label, queryset, explain_options)
+
+        ticket_id = Ticket.objects.values_list("pk", flat=True).first()
+        if ticket_id is not None:
+            posts = TicketPost.objects.filter(
+                ticket_id=ticket_id).order_by("created")
+            self.print_plan(f"posts for ticket #{ticket_id}", posts, explain_options)
+
+    def sample_values(self):
+        """Pick the most common value of each filtered column."""
+        sample = {}
+        for name, column in EQUALITY_FILTERS.items():
+            row = (Ticket.objects.exclude(**{f"{column}__isnull": True})
+                   .order_by().values(column).annotate(n=Count("pk"))
+                   .order_by("-n").first())
+            if row is not None:
+                sample[name] = row[column]
+        return sample
+
+    def print_plan(self, label, queryset, explain_options):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(queryset.explain(**explain_options))
+        self.stdout.write("")
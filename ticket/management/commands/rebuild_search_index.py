@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ticket import search
+
+
+class Command(BaseCommand):
+    help = "Drop and repopulate the full-text search table from tickets and posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        indexed = search.rebuild(chunk_size=options["chunk_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} documents in {elapsed:.1f}s"))
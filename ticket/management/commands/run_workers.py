@@ -0,0 +1,80 @@
+import logging
+import signal
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ticket import tasks
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between retries after the queue itself fails (e.g. the
+# database is locked or unreachable).
+MAX_ERROR_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = "Run background task workers against the database-backed queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Number of worker threads")
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument("--sleep", type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue once and exit")
+        parser.add_argument("--purge-after", type=int, default=7,
+                            help="Delete finished tasks older than this many days")
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+
+        purged = tasks.purge_finished(timedelta(days=options["purge_after"]))
+        if purged:
+            self.stdout.write(f"Purged {purged} finished tasks")
+
+        threads = [
+            threading.Thread(target=self.work, args=(options,), daemon=True)
+            for _ in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(
+            f"Started {len(threads)} worker(s) for: {', '.join(sorted(tasks.registered_tasks()))}"))
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+    def work(self, options):
+        failures = 0
+        try:
+            while not self.stopping.is_set():
+                try:
+                    processed = tasks.run_pending(options["batch_size"])
+                except Exception:
+                    failures += 1
+                    backoff = min(options["sleep"] * 2 ** failures, MAX_ERROR_BACKOFF)
+                    logger.exception(f"Worker loop failed, retrying in {backoff:.0f}s")
+                    # Drop a connection the error may have left unusable.
+                    connection.close()
+                    self.stopping.wait(backoff)
+                    continue
+                failures = 0
+                if processed:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+        finally:
+            connection.close()
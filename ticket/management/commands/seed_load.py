@@ -0,0 +1,183 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ticket import refdata, search
+from ticket.models import Department, Status, Ticket, TicketPost, TicketType
+
+DEPARTMENTS = ["IT Support", "Billing", "Sales", "Human Resources", "Facilities",
+               "Legal", "Engineering", "Customer Success", "Security", "Logistics"]
+TICKET_TYPES = ["Incident", "Service Request", "Question", "Problem", "Change"]
+STATUSES = ["Open", "In Progress", "On Hold", "Closed"]
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+
+SUBJECTS = ("printer", "VPN", "email", "laptop", "invoice", "refund", "password",
+            "order", "badge", "monitor", "license", "payroll", "server", "account")
+PROBLEMS = ("is not working", "keeps crashing", "needs an update", "is very slow",
+            "was charged twice", "cannot be accessed", "is missing", "shows an error")
+PHRASES = (
+    "Thanks for the quick response.", "This is blocking my whole team.",
+    "I have already restarted it twice.", "Please see the attached screenshot.",
+    "Any update on this?", "The issue started this morning.",
+    "Great, that fixed it!", "Still seeing the same problem.",
+    "Escalating to the second line.", "Could you confirm the account number?",
+)
+SAMPLE_UPLOAD = "ticket_uploads/issue.png"
+
+
+class Command(BaseCommand):
+    help = ("Bulk-create a deterministic synthetic dataset (users, departments, "
+            "tickets, posts, followers, attachments) for load testing.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--tickets", type=int, default=10000)
+        parser.add_argument("--posts-per-ticket", type=int, default=5,
+                            help="Average posts per ticket")
+        parser.add_argument("--followers-per-ticket", type=int, default=2,
+                            help="Average followers per ticket")
+        parser.add_argument("--attachment-ratio", type=float, default=0.1,
+                            help="Fraction of posts with an attachment")
+        parser.add_argument("--days", type=int, default=365,
+                            help="Spread ticket activity over this many days")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="load",
+                            help="Username prefix for generated users")
+        parser.add_argument("--password", default="password",
+                            help="Password shared by all generated users")
+        parser.add_argument("--skip-search-index", action="store_true",
+                            help="Do not rebuild the full-text search index")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            self.lookups = self.seed_reference_data()
+            self.user_ids = self.seed_users(
+                options["users"], options["prefix"], options["password"])
+        self.report("users", len(self.user_ids), started)
+
+        totals = {"tickets": 0, "posts": 0, "followers": 0}
+        remaining = options["tickets"]
+        while remaining > 0:
+            size = min(remaining, self.batch_size)
+            with transaction.atomic():
+                counts = self.seed_ticket_batch(size, options)
+            for key, value in counts.items():
+                totals[key] += value
+            remaining -= size
+            self.report("tickets", totals["tickets"], started)
+
+        if not options["skip_search_index"]:
+            search.rebuild()
+        refdata.invalidate()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(self.user_ids)} users, {totals['tickets']} tickets, "
+            f"{totals['posts']} posts and {totals['followers']} followers "
+            f"in {elapsed:.1f}s (seed={options['seed']})"))
+
+    def report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{count} {label} ({count / max(elapsed, 1e-9):.0f}/s)")
+
+    def seed_reference_data(self):
+        statuses = [Status.objects.get_or_create(status=name)[0] for name in STATUSES]
+        departments = [
+            Department.objects.get_or_create(
+                department=name, defaults={"desciption": f"{name} department"})[0]
+            for name in DEPARTMENTS
+        ]
+        types = [
+            TicketType.objects.get_or_create(
+                type=name, defaults={"desciption": f"{name} tickets"})[0]
+            for name in TICKET_TYPES
+        ]
+        return {"statuses": statuses, "departments": departments, "types": types}
+
+    def seed_users(self, count, prefix, password):
+        hashed = make_password(password)
+        existing = set(User.objects.filter(
+            username__startswith=f"{prefix}-").values_list("username", flat=True))
+        users = [
+            User(username=f"{prefix}-{i:07d}", email=f"{prefix}-{i:07d}@example.com",
+                 password=hashed)
+            for i in range(count) if f"{prefix}-{i:07d}" not in existing
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(User.objects.filter(
+            username__startswith=f"{prefix}-").order_by("pk").values_list("pk", flat=True))
+
+    def random_time(self, days):
+        return self.now - timedelta(seconds=self.rng.randint(0, days * 86400))
+
+    def seed_ticket_batch(self, size, options):
+        rng = self.rng
+        lookups = self.lookups
+        tickets = Ticket.objects.bulk_create([
+            Ticket(
+                title=f"{rng.choice(SUBJECTS).capitalize()} {rng.choice(PROBLEMS)}",
+                created_by_id=rng.choice(self.user_ids),
+                assigned_id=rng.choice(self.user_ids) if rng.random() < 0.7 else None,
+                department=rng.choice(lookups["departments"]),
+                type=rng.choice(lookups["types"]),
+                status=rng.choice(lookups["statuses"]),
+                priority=rng.choice(Ticket.TicketPriority.values),
+                sentiment=rng.choice(SENTIMENTS),
+            )
+            for _ in range(size)
+        ], batch_size=self.batch_size)
+
+        posts = []
+        post_times = []
+        for ticket in tickets:
+            created = self.random_time(options["days"])
+            ticket.created = created
+            count = max(1, round(rng.expovariate(1 / options["posts_per_ticket"])))
+            for n in range(count):
+                posts.append(TicketPost(
+                    ticket_id=ticket.pk,
+                    user_id=ticket.created_by_id if n == 0 else rng.choice(self.user_ids),
+                    message=" ".join(rng.choices(PHRASES, k=rng.randint(1, 4))),
+                    private=n > 0 and rng.random() < 0.1,
+                    upload=SAMPLE_UPLOAD if rng.random() < options["attachment_ratio"] else None,
+                ))
+                post_times.append(min(created, self.now))
+                created = created + timedelta(minutes=rng.randint(1, 2880))
+            ticket.updated = min(created, self.now)
+
+        # auto_now/auto_now_add override explicit values on insert, so spread
+        # the timestamps afterwards; bulk_update writes them as given.
+        Ticket.objects.bulk_update(tickets, ["created", "updated"],
+                                   batch_size=self.batch_size)
+        TicketPost.objects.bulk_create(posts, batch_size=self.batch_size)
+        for post, created in zip(posts, post_times):
+            post.created = post.updated = created
+        TicketPost.objects.bulk_update(posts, ["created", "updated"],
+                                       batch_size=self.batch_size)
+
+        Through = Ticket.followers.through
+        followers = []
+        for ticket in tickets:
+            count = min(len(self.user_ids),
+                        round(rng.expovariate(1 / max(options["followers_per_ticket"], 1e-9))))
+            for user_id in rng.sample(self.user_ids, count):
+                followers.append(Through(ticket_id=ticket.pk, user_id=user_id))
+        Through.objects.bulk_create(followers, batch_size=self.batch_size,
+                                    ignore_conflicts=True)
+
+        # bulk_create bypasses the signals that maintain the activity counters.
+        Ticket.objects.filter(pk__gte=tickets[0].pk, pk__lte=tickets[-1].pk).recount()
+
+        return {"tickets": len(tickets), "posts": len(posts), "followers": len(followers)}
@@ -0,0 +1,54 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_hooks = []
+_settings_loaded = False
+
+
+def register(hook):
+    """Register ``hook(name, seconds, labels)`` to receive timings."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+    return hook
+
+
+def unregister(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def _load_settings_hooks():
+    global _settings_loaded
+    if _settings_loaded:
+        return
+    _settings_loaded = True
+    for path in getattr(settings, "TICKET_METRICS_HOOKS", []):
+        register(import_string(path))
+
+
+def observe(name, seconds, **labels):
+    _load_settings_hooks()
+    for hook in list(_hooks):
+        try:
+            hook(name, seconds, labels)
+        except Exception as e:
+            logger.error(f"Metrics hook {hook!r} failed for {name}: {str(e)}")
+
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def log_hook(name, seconds, labels):
+    logger.debug(f"{name} took {seconds * 1000:.2f}ms {labels or ''}")
@@ -0,0 +1,96 @@
+import random
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import instrumentation
+
+
+class InstrumentationMiddleware:
+    """
+    Records query count, DB time, template render time and custom spans for
+    a sampled fraction of requests (INSTRUMENTATION_SAMPLE_RATE) and feeds
+    them to the /metrics registry; unsampled requests pass straight through.
+    Sampled responses to staff users, or to anyone with DEBUG on, also carry
+    a ``Server-Timing`` header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "INSTRUMENTATION_SAMPLE_RATE", 0.1)
+        self.server_timing = getattr(settings, "INSTRUMENTATION_SERVER_TIMING", True)
+        # Stay async under ASGI so async views are not pushed onto a thread.
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def query_wrappers(self, timings):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timings.query_wrapper))
+        return stack
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        timings, token = instrumentation.start_request()
+        try:
+            with self.query_wrappers(timings):
+                response = self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+        return self.finish(request, response, timings, self.show_server_timing(request))
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        # Connections are per thread: queries the async ORM runs on its
+        # executor threads are not counted, spans and templates still are.
+        timings, token = instrumentation.start_request()
+        try:
+            with self.query_wrappers(timings):
+                response = await self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+        # Resolving a lazy session user may query the database.
+        show = await sync_to_async(self.show_server_timing)(request)
+        return self.finish(request, response, timings, show)
+
+    def show_server_timing(self, request):
+        """Query counts and timings are internals; only staff see them outside DEBUG."""
+        if not self.server_timing:
+            return False
+        if settings.DEBUG:
+            return True
+        user = getattr(request, "user", None)
+        return bool(user and user.is_staff)
+
+    def finish(self, request, response, timings, show_server_timing):
+        view = getattr(request.resolver_match, "view_name", None) or "unresolved"
+        instrumentation.record_request(view, request.method, response.status_code, timings)
+        if show_server_timing:
+            response["Server-Timing"] = self.server_timing_header(timings)
+        return response
+
+    def server_timing_header(self, timings):
+        entries = [
+            f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.queries} queries"',
+            f"tpl;dur={timings.template_seconds * 1000:.1f}",
+        ]
+        for name, seconds in sorted(timings.spans.items()):
+            entries.append(f"{name.replace('.', '-')};dur={seconds * 1000:.1f}")
+        entries.append(f"total;dur={timings.elapsed * 1000:.1f}")
+        return ", ".join(entries)
+
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0003_ticket_sentiment"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="ticket",
+            options={"ordering": ["-updated", "-id"]},
+        ),
+    ]
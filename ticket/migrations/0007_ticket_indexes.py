@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0006_notificationoutbox"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["-updated", "-id"], name="ticket_updated_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["status", "-updated"], name="ticket_status_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["assigned", "-updated"], name="ticket_assigned_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["department", "-updated"], name="ticket_dept_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["created_by", "-updated"], name="ticket_creator_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ticketpost",
+            index=models.Index(
+                fields=["ticket", "created"], name="ticketpost_ticket_created_idx"),
+        ),
+    ]
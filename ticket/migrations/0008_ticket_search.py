@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:05
+
+from django.db import migrations
+
+# The DDL is frozen here rather than taken from ticket.search, so later
+# changes to the search backends cannot change what this migration does.
+CREATE_SQL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_search USING fts5("
+        "ticket_id UNINDEXED, content, tokenize = 'porter unicode61')",
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS ticket_search ("
+        "kind varchar(16) NOT NULL, object_id bigint NOT NULL, "
+        "ticket_id bigint NOT NULL, document tsvector NOT NULL, "
+        "PRIMARY KEY (kind, object_id))",
+        "CREATE INDEX IF NOT EXISTS ticket_search_document_idx "
+        "ON ticket_search USING GIN (document)",
+    ],
+}
+
+
+def create_search_table(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+            cursor.execute(sql)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS ticket_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0007_ticket_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
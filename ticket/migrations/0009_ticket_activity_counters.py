@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:05
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Ticket = apps.get_model("ticket", "Ticket")
+    TicketPost = apps.get_model("ticket", "TicketPost")
+    Followers = Ticket.followers.through
+    posts = TicketPost.objects.filter(ticket=OuterRef("pk")).order_by().values("ticket")
+    followers = Followers.objects.filter(ticket=OuterRef("pk")).order_by().values("ticket")
+    Ticket.objects.update(
+        post_count=Coalesce(
+            Subquery(posts.annotate(total=Count("pk")).values("total")), 0),
+        last_post_at=Subquery(posts.annotate(last=Max("created")).values("last")),
+        follower_count=Coalesce(
+            Subquery(followers.annotate(total=Count("pk")).values("total")), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0008_ticket_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="post_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="last_post_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="follower_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0009_ticket_activity_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="batch",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="summary",
+            field=models.TextField(blank=True),
+        ),
+    ]
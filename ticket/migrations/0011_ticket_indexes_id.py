@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+INDEXES = [
+    ("status", "ticket_status_updated_idx"),
+    ("assigned", "ticket_assigned_updated_idx"),
+    ("department", "ticket_dept_updated_idx"),
+    ("created_by", "ticket_creator_updated_idx"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0010_notificationoutbox_batch"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(model_name="ticket", name=name)
+        for _, name in INDEXES
+    ] + [
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(fields=[field, "-updated", "-id"], name=name),
+        )
+        for field, name in INDEXES
+    ]
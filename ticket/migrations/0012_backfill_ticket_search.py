@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:30
+
+from django.db import migrations
+
+# Index every existing ticket title and post message. 0008 created the
+# table empty and only later writes were indexed by signals. Rows already
+# indexed are overwritten, so this is safe to re-run. The SQL is frozen
+# here, like the DDL in 0008; rowids follow ticket.search.SqliteBackend.
+BACKFILL_SQL = {
+    "sqlite": [
+        "INSERT OR REPLACE INTO ticket_search (rowid, ticket_id, content) "
+        "SELECT id * 2, id, COALESCE(title, '') FROM {ticket}",
+        "INSERT OR REPLACE INTO ticket_search (rowid, ticket_id, content) "
+        "SELECT id * 2 + 1, ticket_id, COALESCE(message, '') FROM {post}",
+    ],
+    "postgresql": [
+        "INSERT INTO ticket_search (kind, object_id, ticket_id, document) "
+        "SELECT 'ticket', id, id, to_tsvector('english'::regconfig, COALESCE(title, '')) "
+        "FROM {ticket} ON CONFLICT (kind, object_id) DO UPDATE SET "
+        "ticket_id = EXCLUDED.ticket_id, document = EXCLUDED.document",
+        "INSERT INTO ticket_search (kind, object_id, ticket_id, document) "
+        "SELECT 'post', id, ticket_id, to_tsvector('english'::regconfig, COALESCE(message, '')) "
+        "FROM {post} ON CONFLICT (kind, object_id) DO UPDATE SET "
+        "ticket_id = EXCLUDED.ticket_id, document = EXCLUDED.document",
+    ],
+}
+
+
+def backfill_search_table(apps, schema_editor):
+    tables = {
+        "ticket": schema_editor.quote_name(apps.get_model("ticket", "Ticket")._meta.db_table),
+        "post": schema_editor.quote_name(apps.get_model("ticket", "TicketPost")._meta.db_table),
+    }
+    with schema_editor.connection.cursor() as cursor:
+        for sql in BACKFILL_SQL.get(schema_editor.connection.vendor, []):
+            cursor.execute(sql.format(**tables))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0011_ticket_indexes_id"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_table, migrations.RunPython.noop),
+    ]
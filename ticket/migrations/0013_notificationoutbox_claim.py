@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ticket", "0012_backfill_ticket_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="claimed_by",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+        migrations.AlterField(
+            model_name="notificationoutbox",
+            name="state",
+            field=models.CharField(choices=[("pending", "Pending"), ("sending", "Sending"), ("sent", "Sent"), ("failed", "Failed")], default="pending", max_length=20),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 
 
@@ -29,6 +32,61 @@ class Status(models.Model):
         return self.status
 
 
+class TicketQuerySet(models.QuerySet):
+    # Columns the dashboard and "my tickets" tables actually render.
+    LIST_FIELDS = (
+        "title", "priority", "sentiment", "updated", "created",
+        "post_count", "last_post_at", "follower_count",
+        "status__status", "department__department", "type__type",
+        "assigned__username", "created_by__username",
+    )
+
+    def for_list(self):
+        """Join the lookups shown in ticket tables and skip unused columns."""
+        return self.select_related(
+            "status", "department", "type", "assigned", "created_by"
+        ).only(*self.LIST_FIELDS)
+
+    def tab_counts(self, user):
+        """
+        Created/assigned/followed totals for ``user`` in one query. Only the
+        user's own tickets are scanned; DISTINCT undoes the follower join fan-out.
+        """
+        mine = Q(created_by=user) | Q(assigned=user) | Q(followers=user)
+        return self.filter(mine).order_by().aggregate(
+            created_count=Count("pk", filter=Q(created_by=user), distinct=True),
+            assigned_count=Count("pk", filter=Q(assigned=user), distinct=True),
+            followed_count=Count("pk", filter=Q(followers=user), distinct=True),
+        )
+
+    def record_post(self, ticket_id, created_at):
+        """
+        Bump the post counters for a newly created post. Returns True when it
+        is the ticket's first post, decided by the same conditional UPDATE.
+        """
+        first = self.filter(pk=ticket_id, post_count=0).update(
+            post_count=1, last_post_at=created_at)
+        if not first:
+            self.filter(pk=ticket_id).update(
+                post_count=F("post_count") + 1, last_post_at=created_at)
+        return bool(first)
+
+    def recount(self):
+        """Recompute the denormalized counters from the posts and followers tables."""
+        from_posts = TicketPost.objects.filter(ticket=OuterRef("pk")).order_by().values("ticket")
+        from_followers = (
+            Ticket.followers.through.objects.filter(ticket=OuterRef("pk"))
+            .order_by().values("ticket")
+        )
+        return self.order_by().update(
+            post_count=Coalesce(
+                Subquery(from_posts.annotate(total=Count("pk")).values("total")), 0),
+            last_post_at=Subquery(from_posts.annotate(last=Max("created")).values("last")),
+            follower_count=Coalesce(
+                Subquery(from_followers.annotate(total=Count("pk")).values("total")), 0),
+        )
+
+
 class Ticket(models.Model):
     class TicketPriority(models.IntegerChoices):
         HIGH = 1, "High"
@@ -65,14 +123,35 @@ class Ticket(models.Model):
         User, blank=True, related_name="followed_tickets"
     )
     sentiment = models.CharField(max_length=200, null=True, blank=True)
+    # Maintained by ticket.signals; repair with `manage.py recount_tickets`.
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    last_post_at = models.DateTimeField(null=True, blank=True, editable=False)
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
     updated = models.DateTimeField(auto_now=True)
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = TicketQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
     class Meta:
-        ordering = ["-updated"]
+        ordering = ["-updated", "-id"]
+        # Each TicketFilter equality column followed by the full default
+        # ordering, so a filtered dashboard page or keyset page is an index
+        # range scan without a sort.
+        indexes = [
+            models.Index(fields=["-updated", "-id"],
+                         name="ticket_updated_id_idx"),
+            models.Index(fields=["status", "-updated", "-id"],
+                         name="ticket_status_updated_idx"),
+            models.Index(fields=["assigned", "-updated", "-id"],
+                         name="ticket_assigned_updated_idx"),
+            models.Index(fields=["department", "-updated", "-id"],
+                         name="ticket_dept_updated_idx"),
+            models.Index(fields=["created_by", "-updated", "-id"],
+                         name="ticket_creator_updated_idx"),
+        ]
 
 
 class TicketPost(models.Model):
@@ -98,3 +177,86 @@ class TicketPost(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["ticket", "created"],
+                         name="ticketpost_ticket_created_idx"),
+        ]
+
+
+class BackgroundTask(models.Model):
+    class State(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    name = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    state = models.CharField(
+        max_length=20, choices=State.choices, default=State.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    updated = models.DateTimeField(auto_now=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.state})"
+
+    class Meta:
+        verbose_name = "Background Task"
+        verbose_name_plural = "Background Tasks"
+        indexes = [
+            models.Index(fields=["state", "run_after"],
+                         name="ticket_task_state_run_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=Q(state__in=["pending", "running"]),
+                name="ticket_task_unique_active_key",
+            ),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    class State(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENDING = "sending", "Sending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    ticket = models.ForeignKey(
+        Ticket, on_delete=models.CASCADE, related_name="notifications")
+    post = models.ForeignKey(
+        TicketPost, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="notifications")
+    recipient = models.EmailField()
+    # Entries written by one bulk operation share a batch id and are sent as
+    # a single message per recipient; summary describes the change.
+    batch = models.CharField(max_length=32, blank=True, default="")
+    summary = models.TextField(blank=True)
+    state = models.CharField(
+        max_length=20, choices=State.choices, default=State.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # While sending, next_attempt_at is the end of the dispatcher's lease
+    # and claimed_by identifies that dispatcher run.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True, default="")
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Ticket #{self.ticket_id} -> {self.recipient} ({self.state})"
+
+    class Meta:
+        verbose_name = "Notification"
+        verbose_name_plural = "Notification Outbox"
+        indexes = [
+            models.Index(fields=["state", "next_attempt_at"],
+                         name="ticket_outbox_state_next_idx"),
+        ]
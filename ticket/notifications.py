@@ -0,0 +1,292 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Min
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, metrics, tasks
+from .models import NotificationOutbox, Ticket
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 30
+# Seconds a dispatcher may hold claimed entries before another one may
+# send them; only reached when a dispatcher dies mid-batch.
+LEASE_SECONDS = 300
+
+
+def digest_window():
+    return getattr(settings, "NOTIFICATION_DIGEST_WINDOW", 60)
+
+
+def max_attempts():
+    return getattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 5)
+
+
+def recipient_cache():
+    return caching.cache_for("NOTIFICATION_CACHE_ALIAS")
+
+
+def recipient_cache_key(ticket_id):
+    return f"ticket:{ticket_id}:recipients"
+
+
+def resolve_recipients(ticket_id):
+    """
+    Map user id -> email for the ticket's creator, assignee and followers.
+
+    The three sources are read as one UNION of values-only queries and the
+    result is cached per ticket until the followers or assignment change.
+    """
+    cache = recipient_cache()
+    key = recipient_cache_key(ticket_id)
+    recipients = cache.get(key)
+    if recipients is not None:
+        return recipients
+
+    Followers = Ticket.followers.through
+    ticket = Ticket.objects.filter(pk=ticket_id).order_by()
+    rows = ticket.values_list("created_by__id", "created_by__email").union(
+        ticket.values_list("assigned__id", "assigned__email"),
+        Followers.objects.filter(ticket_id=ticket_id).order_by().values_list(
+            "user__id", "user__email"),
+    )
+    recipients = {
+        user_id: email for user_id, email in rows if user_id is not None and email
+    }
+    cache.set(key, recipients,
+              getattr(settings, "NOTIFICATION_RECIPIENT_TTL", 3600))
+    return recipients
+
+
+def resolve_recipients_many(ticket_ids):
+    """
+    ``{ticket_id: {user_id: email}}`` for many tickets with one UNION query.
+    Results also warm the per-ticket cache used by resolve_recipients.
+    """
+    ticket_ids = list(ticket_ids)
+    Followers = Ticket.followers.through
+    tickets = Ticket.objects.filter(pk__in=ticket_ids).order_by()
+    rows = tickets.values_list("pk", "created_by__id", "created_by__email").union(
+        tickets.values_list("pk", "assigned__id", "assigned__email"),
+        Followers.objects.filter(ticket_id__in=ticket_ids).order_by().values_list(
+            "ticket_id", "user__id", "user__email"),
+    )
+    recipients = {ticket_id: {} for ticket_id in ticket_ids}
+    for ticket_id, user_id, email in rows:
+        if user_id is not None and email:
+            recipients[ticket_id][user_id] = email
+    recipient_cache().set_many(
+        {recipient_cache_key(pk): found for pk, found in recipients.items()},
+        getattr(settings, "NOTIFICATION_RECIPIENT_TTL", 3600))
+    return recipients
+
+
+def invalidate_recipients(*ticket_ids):
+    """Drop the cached recipient sets once the current transaction commits."""
+    caching.delete_on_commit(
+        "NOTIFICATION_CACHE_ALIAS", [recipient_cache_key(pk) for pk in ticket_ids])
+
+
+def queue(ticket, post, recipients):
+    """Write one outbox row per recipient and schedule the dispatcher."""
+    entries = NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(ticket=ticket, post=post, recipient=email)
+        for email in sorted(set(recipients))
+    ])
+    if entries:
+        schedule_dispatch(digest_window())
+    return entries
+
+
+def queue_batch(summary, recipients_by_ticket):
+    """
+    Queue one notification per recipient covering every ticket in
+    ``recipients_by_ticket`` (``{ticket_id: [email, ...]}``), e.g. after a
+    bulk status change. ``summary`` describes what happened.
+    """
+    batch = uuid.uuid4().hex
+    # Ordered by recipient so a recipient's rows are contiguous in id order
+    # and normally land in the same dispatcher batch.
+    entries = NotificationOutbox.objects.bulk_create(sorted(
+        (
+            NotificationOutbox(ticket_id=ticket_id, recipient=email,
+                               batch=batch, summary=summary)
+            for ticket_id, emails in recipients_by_ticket.items()
+            for email in set(emails)
+        ),
+        key=lambda entry: (entry.recipient, entry.ticket_id),
+    ))
+    if entries:
+        schedule_dispatch(digest_window())
+    return entries
+
+
+def schedule_dispatch(delay):
+    """
+    Queue a dispatcher run ``delay`` seconds from now. Requests landing in
+    the same window share a single run, which is what turns a burst of
+    updates into one digest per ticket and recipient.
+    """
+    window = max(digest_window(), 1)
+    run_at = timezone.now().timestamp() + delay
+    bucket = int(run_at // window)
+    return tasks.enqueue(
+        "notifications.dispatch",
+        dedupe_key=f"notifications:dispatch:{bucket}",
+        delay=delay,
+    )
+
+
+def build_digest(recipient, entries):
+    if entries[0].batch:
+        return build_batch_digest(recipient, entries)
+
+    ticket = entries[0].ticket
+    ticket_url = reverse('view_ticket', kwargs={'pk': ticket.id})
+    posts = [entry.post for entry in entries if entry.post is not None]
+
+    subject = f'Ticket #{ticket.id} Update: {ticket.title}'
+    if len(posts) > 1:
+        subject = f'{subject} ({len(posts)} new responses)'
+
+    sections = [
+        f'''Updated by: {post.user.username if post.user else 'Unknown'}
+Message:
+{post.message}
+'''
+        for post in posts
+    ]
+    body = f'''New activity on ticket #{ticket.id}
+
+Title: {ticket.title}
+
+{chr(10).join(sections)}
+View ticket: {ticket_url}
+'''
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient])
+
+
+def build_batch_digest(recipient, entries):
+    tickets = sorted({entry.ticket_id: entry.ticket for entry in entries}.values(),
+                     key=lambda ticket: ticket.id)
+    summary = entries[0].summary
+    subject = f'{len(tickets)} tickets updated: {summary}'
+    lines = [
+        f"#{ticket.id} {ticket.title} - {reverse('view_ticket', kwargs={'pk': ticket.id})}"
+        for ticket in tickets
+    ]
+    body = f'''{summary}
+
+The following tickets were updated:
+
+{chr(10).join(lines)}
+'''
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient])
+
+
+def _record_failure(entry_ids, error):
+    now = timezone.now()
+    pending = NotificationOutbox.objects.filter(id__in=entry_ids)
+    attempts = pending.values_list("attempts", flat=True).first() or 0
+    backoff = RETRY_BASE_SECONDS * 2 ** attempts
+    pending.update(
+        state=NotificationOutbox.State.PENDING,
+        claimed_by="",
+        attempts=F("attempts") + 1,
+        last_error=str(error),
+        next_attempt_at=now + timedelta(seconds=backoff),
+    )
+    NotificationOutbox.objects.filter(
+        id__in=entry_ids, attempts__gte=max_attempts(),
+    ).update(state=NotificationOutbox.State.FAILED)
+
+
+@tasks.task("notifications.dispatch")
+def dispatch(batch_size=500):
+    """
+    Send due outbox entries as one digest per ticket and recipient, or per
+    bulk-operation batch and recipient.
+    """
+    while True:
+        due = _claim(batch_size)
+
+        groups = defaultdict(list)
+        for entry in due:
+            groups[(entry.batch or entry.ticket_id, entry.recipient)].append(entry)
+
+        if groups:
+            with metrics.timed("email.dispatch", messages=len(groups)):
+                _send_groups(groups)
+        if len(due) < batch_size:
+            break
+
+    next_due = NotificationOutbox.objects.filter(
+        state__in=[NotificationOutbox.State.PENDING, NotificationOutbox.State.SENDING],
+    ).aggregate(next_due=Min("next_attempt_at"))["next_due"]
+    if next_due is not None:
+        # Retries wait at least one window so they land in a later run than
+        # this one, which still holds the current window's dedupe key.
+        delay = (next_due - timezone.now()).total_seconds()
+        schedule_dispatch(max(delay, digest_window()))
+
+
+def _claim(batch_size):
+    """
+    Claim up to ``batch_size`` due entries for this run and return them.
+    The claim is one conditional UPDATE on the state and due time, so two
+    dispatchers running at once never send the same entry; entries left
+    claimed by a dispatcher that died are claimed again once its lease ends.
+    """
+    now = timezone.now()
+    due = NotificationOutbox.objects.filter(
+        state__in=[NotificationOutbox.State.PENDING, NotificationOutbox.State.SENDING],
+        next_attempt_at__lte=now,
+    )
+    ids = list(due.order_by("id").values_list("id", flat=True)[:batch_size])
+    run = uuid.uuid4().hex
+    due.filter(id__in=ids).update(
+        state=NotificationOutbox.State.SENDING,
+        claimed_by=run,
+        next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+    )
+    return list(
+        NotificationOutbox.objects.filter(
+            state=NotificationOutbox.State.SENDING, claimed_by=run,
+        ).select_related("ticket", "post__user").order_by("id")
+    )
+
+
+def _send_groups(groups):
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not open mail connection: {str(e)}")
+        _record_failure(
+            [entry.id for entries in groups.values() for entry in entries], e)
+        return
+
+    sent_ids = []
+    try:
+        for (group, recipient), entries in groups.items():
+            entry_ids = [entry.id for entry in entries]
+            try:
+                connection.send_messages([build_digest(recipient, entries)])
+            except Exception as e:
+                logger.error(
+                    f"Error sending notification {group} to {recipient}: {str(e)}")
+                _record_failure(entry_ids, e)
+            else:
+                sent_ids.extend(entry_ids)
+    finally:
+        connection.close()
+
+    NotificationOutbox.objects.filter(id__in=sent_ids).update(
+        state=NotificationOutbox.State.SENT, sent_at=timezone.now(), claimed_by="",
+        attempts=F("attempts") + 1)
@@ -0,0 +1,163 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values):
+    raw = "|".join([direction] + [
+        value.isoformat() if isinstance(value, datetime) else str(value)
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, updated, pk = base64.urlsafe_b64decode(
+            padded.encode()).decode().split("|")
+        if direction not in ("n", "p"):
+            raise ValueError(direction)
+        return direction, (datetime.fromisoformat(updated), int(pk))
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def keyset_filter(fields, values, descending):
+    """
+    Rows strictly after ``values`` in (field, ...) order. The expanded OR is
+    ANDed with an inclusive bound on the leading field so the database can
+    seek the index instead of scanning it from the start.
+    """
+    lookup = "lt" if descending else "gt"
+    condition = Q()
+    for i, field in enumerate(fields):
+        branch = Q(**{f"{field}__{lookup}": values[i]})
+        for previous, value in zip(fields[:i], values[:i]):
+            branch &= Q(**{previous: value})
+        condition |= branch
+    return Q(**{f"{fields[0]}__{lookup}e": values[0]}) & condition
+
+
+def approximate_count(queryset, cap):
+    """Count at most ``cap`` + 1 rows so the cost is bounded on deep result sets."""
+    return queryset.order_by().values("pk")[:cap + 1].count()
+
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, has_next, has_previous, fields):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.fields = fields
+        self.approximate_total = None
+        self.total_capped = False
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def _cursor_for(self, direction, obj):
+        return encode_cursor(direction, [getattr(obj, f) for f in self.fields])
+
+    @property
+    def next_cursor(self):
+        if self.has_next_page and self.object_list:
+            return self._cursor_for("n", self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous_page and self.object_list:
+            return self._cursor_for("p", self.object_list[0])
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over ``(updated, id)``.
+
+    Pages are fetched with ``WHERE (updated, id) < cursor LIMIT n + 1`` instead
+    of ``OFFSET``, so every page costs the same and rows touched by concurrent
+    updates move to the top without shifting the rest of the listing.
+    """
+
+    fields = ("updated", "id")
+
+    def __init__(self, queryset, per_page, descending=True, count_cap=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = descending
+        self.count_cap = count_cap
+
+    def _ordering(self, descending):
+        prefix = "-" if descending else ""
+        return [f"{prefix}{field}" for field in self.fields]
+
+    def _window(self, cursor):
+        direction, values = "n", None
+        if cursor:
+            try:
+                direction, values = decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = "n", None
+
+        backwards = direction == "p"
+        descending = self.descending != backwards
+        queryset = self.queryset.order_by(*self._ordering(descending))
+        if values is not None:
+            queryset = queryset.filter(
+                keyset_filter(self.fields, values, descending))
+        return queryset[:self.per_page + 1], values, backwards
+
+    def _page(self, rows, values, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            return CursorPage(rows, True, has_more, self.fields)
+        return CursorPage(rows, has_more, values is not None, self.fields)
+
+    def page(self, cursor=None):
+        window, values, backwards = self._window(cursor)
+        page = self._page(list(window), values, backwards)
+
+        if self.count_cap:
+            total = approximate_count(self.queryset, self.count_cap)
+            page.approximate_total = min(total, self.count_cap)
+            page.total_capped = total > self.count_cap
+        return page
+
+    async def apage(self, cursor=None):
+        """``page()`` for async views, using the async ORM."""
+        window, values, backwards = self._window(cursor)
+        page = self._page([row async for row in window], values, backwards)
+
+        if self.count_cap:
+            total = await self.queryset.order_by().values("pk")[:self.count_cap + 1].acount()
+            page.approximate_total = min(total, self.count_cap)
+            page.total_capped = total > self.count_cap
+        return page
+
+
+class PostCursorPaginator(CursorPaginator):
+    """Keyset paginator over a ticket thread's ``(created, id)``."""
+
+    fields = ("created", "id")
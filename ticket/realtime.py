@@ -0,0 +1,274 @@
+"""
+Real-time ticket events pushed to browsers and API clients over WebSockets.
+
+ticket.signals publishes small JSON events (ids and labels only; clients
+fetch content through the regular, login-protected views) to a channel
+layer, addressed to per-ticket and per-department groups.
+``websocket_application``, mounted by ticketsystem.asgi, authenticates each
+socket from the session cookie or a JWT ``?token=`` and forwards the events
+of the groups it asked for:
+
+    /ws/tickets/<ticket id>/
+    /ws/departments/?department=<id>&department=<id>...
+
+The default InMemoryChannelLayer only reaches sockets held by the same
+process. Deployments running several ASGI processes, or serving writes from
+WSGI workers, point REALTIME_CHANNEL_LAYER at RedisChannelLayer.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+from collections import defaultdict
+from http.cookies import CookieError, SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http.request import split_domain_port, validate_host
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TICKET_PATH = re.compile(r"^/ws/tickets/(?P<ticket_id>\d+)/$")
+DEPARTMENTS_PATH = re.compile(r"^/ws/departments/$")
+CLOSE_FORBIDDEN = 4403
+
+
+def ticket_group(ticket_id):
+    return f"ticket.{ticket_id}"
+
+
+def department_group(department_id):
+    return f"department.{department_id}"
+
+
+class Subscription:
+    """A socket's inbox. ``deliver`` may be called from any thread."""
+
+    def __init__(self, groups, capacity):
+        self.groups = groups
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(capacity)
+        self.dropped = 0
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self.put, message)
+        except RuntimeError:
+            # The socket's event loop has already shut down.
+            pass
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client that stopped reading loses events, not server memory.
+            self.dropped += 1
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InMemoryChannelLayer:
+    """Process-local fan-out for single-process deployments."""
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._groups = defaultdict(set)
+
+    async def subscribe(self, groups):
+        subscription = Subscription(groups, self.capacity)
+        with self._lock:
+            for group in groups:
+                self._groups[group].add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        with self._lock:
+            for group in subscription.groups:
+                members = self._groups.get(group)
+                if members is not None:
+                    members.discard(subscription)
+                    if not members:
+                        del self._groups[group]
+
+    def publish(self, group, message):
+        with self._lock:
+            members = list(self._groups.get(group, ()))
+        for subscription in members:
+            subscription.deliver(message)
+
+
+class RedisChannelLayer:
+    """
+    Fan-out through Redis pub/sub, so events published by any process reach
+    sockets on every node. Requires the ``redis`` package.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", prefix="ticket-events:", capacity=100):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisChannelLayer requires the 'redis' package.")
+        self.url = url
+        self.prefix = prefix
+        self.capacity = capacity
+        self._client = redis.Redis.from_url(url)
+        self._readers = {}
+
+    async def subscribe(self, groups):
+        import redis.asyncio
+
+        subscription = Subscription(groups, self.capacity)
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*[self.prefix + group for group in groups])
+        reader = asyncio.create_task(self._read(pubsub, subscription))
+        self._readers[subscription] = (reader, pubsub, client)
+        return subscription
+
+    async def _read(self, pubsub, subscription):
+        async for item in pubsub.listen():
+            if item["type"] == "message":
+                subscription.put(json.loads(item["data"]))
+
+    async def unsubscribe(self, subscription):
+        reader, pubsub, client = self._readers.pop(subscription)
+        reader.cancel()
+        await pubsub.aclose()
+        await client.aclose()
+
+    def publish(self, group, message):
+        self._client.publish(self.prefix + group, json.dumps(message))
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_layer():
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                config = getattr(settings, "REALTIME_CHANNEL_LAYER", {})
+                backend = import_string(
+                    config.get("BACKEND", "ticket.realtime.InMemoryChannelLayer"))
+                _layer = backend(**config.get("OPTIONS", {}))
+    return _layer
+
+
+def broadcast(event, ticket_id, department_id=None):
+    """Publish ``event`` to the ticket's group and its department's group after commit."""
+    groups = [ticket_group(ticket_id)]
+    if department_id is not None:
+        groups.append(department_group(department_id))
+
+    def publish():
+        layer = get_layer()
+        for group in groups:
+            try:
+                layer.publish(group, event)
+            except Exception as e:
+                logger.error(f"Error publishing {event.get('type')} to {group}: {str(e)}")
+
+    transaction.on_commit(publish)
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def origin_allowed(scope):
+    """Reject cross-site browser sockets; clients that send no Origin are allowed."""
+    origin = _header(scope, b"origin")
+    if origin is None:
+        return True
+    domain, _ = split_domain_port(urlsplit(origin).netloc)
+    allowed = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed:
+        allowed = [".localhost", "127.0.0.1", "[::1]"]
+    return bool(domain) and validate_host(domain, allowed)
+
+
+async def authenticate(scope, params):
+    """The active user behind a socket's JWT ``token`` or session cookie, else None."""
+    from django.contrib.auth import aget_user
+    from django.contrib.auth.models import User
+
+    token = params.get("token", [None])[0]
+    if token:
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        try:
+            user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            return None
+        return await User.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id, "is_active": True}).afirst()
+
+    cookies = SimpleCookie()
+    try:
+        cookies.load(_header(scope, b"cookie") or "")
+    except CookieError:
+        return None
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user = await aget_user(SimpleNamespace(session=session))
+    return user if user.is_authenticated and user.is_active else None
+
+
+def groups_for(path, params):
+    match = TICKET_PATH.match(path)
+    if match:
+        return [ticket_group(match["ticket_id"])]
+    if DEPARTMENTS_PATH.match(path):
+        return [department_group(pk) for pk in params.get("department", []) if pk.isdigit()]
+    return []
+
+
+async def websocket_application(scope, receive, send):
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+
+    params = parse_qs(scope.get("query_string", b"").decode())
+    groups = groups_for(scope["path"], params)
+    if not groups or not origin_allowed(scope) or await authenticate(scope, params) is None:
+        # Closing before accepting turns the handshake into an HTTP 403.
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    layer = get_layer()
+    subscription = await layer.subscribe(groups)
+    await send({"type": "websocket.accept"})
+    forwarder = asyncio.create_task(_forward(subscription, send))
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            if event.get("text") == "ping":
+                await send({"type": "websocket.send", "text": "pong"})
+    finally:
+        forwarder.cancel()
+        await layer.unsubscribe(subscription)
+
+
+async def _forward(subscription, send):
+    while True:
+        message = await subscription.get()
+        await send({"type": "websocket.send", "text": json.dumps(message)})
@@ -0,0 +1,138 @@
+"""
+In-process cache for the small lookup tables (Status, Department, TicketType).
+
+Each process keeps a snapshot of every table tagged with a version number.
+Saving or deleting a row bumps the version, which makes every process reload
+its snapshot on next use. With REFDATA_CACHE_ALIAS set the version lives in
+that Django cache backend, so invalidations reach all workers; otherwise it
+is a per-process counter that also moves every REFDATA_CACHE_TTL seconds,
+so a change made through another process shows up within that time.
+Cached instances are shared between requests and must be treated as
+read-only.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+
+from .models import Department, Status, TicketType
+
+VERSION_KEY = "ticket:refdata:version"
+
+_lock = threading.Lock()
+_local_version = 0
+_local_version_at = time.monotonic()
+_snapshot = {"version": None, "tables": {}}
+
+
+def enabled():
+    return getattr(settings, "REFDATA_CACHE_ENABLED", True)
+
+
+def _shared_cache():
+    alias = getattr(settings, "REFDATA_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def current_version():
+    shared = _shared_cache()
+    if shared is None:
+        return _local_current_version()
+    version = shared.get(VERSION_KEY)
+    if version is None:
+        shared.add(VERSION_KEY, 1, None)
+        version = shared.get(VERSION_KEY, 1)
+    return version
+
+
+def _local_current_version():
+    global _local_version, _local_version_at
+    ttl = getattr(settings, "REFDATA_CACHE_TTL", 60)
+    with _lock:
+        if time.monotonic() - _local_version_at >= ttl:
+            _local_version += 1
+            _local_version_at = time.monotonic()
+        return _local_version
+
+
+def invalidate():
+    global _local_version, _local_version_at
+    with _lock:
+        _local_version += 1
+        _local_version_at = time.monotonic()
+        _snapshot["version"] = None
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            shared.incr(VERSION_KEY)
+        except ValueError:
+            shared.set(VERSION_KEY, 1, None)
+
+
+def _load(model):
+    version = current_version()
+    with _lock:
+        if _snapshot["version"] != version:
+            _snapshot["version"] = version
+            _snapshot["tables"] = {}
+        table = _snapshot["tables"].get(model)
+        if table is None:
+            objects = list(model.objects.order_by("pk"))
+            table = {"rows": objects, "by_pk": {row.pk: row for row in objects}}
+            _snapshot["tables"][model] = table
+    return table
+
+
+def rows(model):
+    if not enabled():
+        return list(model.objects.order_by("pk"))
+    return list(_load(model)["rows"])
+
+
+def get(model, pk):
+    """Return the row with primary key ``pk`` or raise ``model.DoesNotExist``."""
+    if not enabled():
+        return model.objects.get(pk=pk)
+    try:
+        row = _load(model)["by_pk"].get(int(pk))
+    except (TypeError, ValueError):
+        row = None
+    if row is None:
+        raise model.DoesNotExist(f"{model.__name__} matching pk={pk!r} does not exist.")
+    return row
+
+
+def get_or_404(model, pk):
+    try:
+        return get(model, pk)
+    except model.DoesNotExist:
+        raise Http404(f"No {model._meta.object_name} matches the given query.")
+
+
+def choices(model):
+    """``(pk, label)`` pairs for select widgets."""
+    return [(row.pk, str(row)) for row in rows(model)]
+
+
+def statuses():
+    return rows(Status)
+
+
+def departments():
+    return rows(Department)
+
+
+def ticket_types():
+    return rows(TicketType)
+
+
+def get_status(name):
+    """Look up a Status by its name, e.g. ``get_status("Open")``."""
+    if not enabled():
+        return Status.objects.get(status=name)
+    for row in _load(Status)["rows"]:
+        if row.status == name:
+            return row
+    raise Status.DoesNotExist(f"Status {name!r} does not exist.")
@@ -0,0 +1,217 @@
+"""
+Full-text search over ticket titles and post messages.
+
+Documents live in a ``ticket_search`` table that has one row per ticket
+title and one row per post. On SQLite it is an FTS5 virtual table ranked
+with bm25(). On PostgreSQL it is a regular table with a tsvector column,
+a GIN index and ts_rank(). Other databases fall back to ``icontains``.
+Signals keep the table current; ``manage.py rebuild_search_index``
+repopulates it.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from . import metrics
+from .models import Ticket, TicketPost
+
+TABLE = "ticket_search"
+KIND_TICKET = "ticket"
+KIND_POST = "post"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def max_results():
+    return getattr(settings, "SEARCH_MAX_RESULTS", 1000)
+
+
+class FallbackBackend:
+    """Unindexed LIKE scan; used on databases without a search table."""
+
+    def create_schema(self, cursor):
+        pass
+
+    def drop_schema(self, cursor):
+        pass
+
+    def index(self, cursor, kind, object_id, ticket_id, content):
+        pass
+
+    def remove(self, cursor, kind, object_ids):
+        pass
+
+    def search(self, cursor, text, limit):
+        ids = Ticket.objects.filter(
+            Q(title__icontains=text) | Q(posts__message__icontains=text)
+        ).order_by("-updated").values_list("pk", flat=True).distinct()[:limit]
+        return [(pk, 0.0) for pk in ids]
+
+
+class SqliteBackend(FallbackBackend):
+    """
+    FTS5 table keyed by rowid. UNINDEXED columns cannot be looked up without
+    a full scan, so the document identity is packed into the rowid instead:
+    ``object_id * 2`` for ticket titles and ``object_id * 2 + 1`` for posts.
+    """
+
+    def rowid(self, kind, object_id):
+        return int(object_id) * 2 + (1 if kind == KIND_POST else 0)
+
+    def create_schema(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "ticket_id UNINDEXED, content, tokenize = 'porter unicode61')"
+        )
+
+    def drop_schema(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def index(self, cursor, kind, object_id, ticket_id, content):
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABLE} (rowid, ticket_id, content) "
+            "VALUES (%s, %s, %s)",
+            [self.rowid(kind, object_id), ticket_id, content or ""],
+        )
+
+    def remove(self, cursor, kind, object_ids):
+        for object_id in object_ids:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid = %s",
+                [self.rowid(kind, object_id)],
+            )
+
+    def match_expression(self, text):
+        words = _WORD_RE.findall(text)
+        if not words:
+            return None
+        # Quote every term so user input cannot inject FTS5 operators, and
+        # let the last one match as a prefix for search-as-you-type.
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+    def search(self, cursor, text, limit):
+        expression = self.match_expression(text)
+        if expression is None:
+            return []
+        # bm25() is only allowed on the rows of a full-text query, not inside
+        # an aggregate, so score each document in a subquery and group
+        # outside. The inner LIMIT -1 (no limit) stops SQLite from flattening
+        # the subquery back into the aggregate.
+        cursor.execute(
+            f"SELECT ticket_id, MIN(score) FROM ("
+            f"SELECT ticket_id, bm25({TABLE}) AS score FROM {TABLE} "
+            f"WHERE {TABLE} MATCH %s LIMIT -1) GROUP BY ticket_id ORDER BY 2 LIMIT %s",
+            [expression, limit],
+        )
+        # bm25() is lower-is-better; flip it so larger always ranks higher.
+        return [(int(ticket_id), -score) for ticket_id, score in cursor.fetchall()]
+
+
+class PostgresBackend(FallbackBackend):
+    config = "english"
+
+    def create_schema(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+            "kind varchar(16) NOT NULL, object_id bigint NOT NULL, "
+            "ticket_id bigint NOT NULL, document tsvector NOT NULL, "
+            "PRIMARY KEY (kind, object_id))"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx "
+            f"ON {TABLE} USING GIN (document)"
+        )
+
+    def drop_schema(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def index(self, cursor, kind, object_id, ticket_id, content):
+        cursor.execute(
+            f"INSERT INTO {TABLE} (kind, object_id, ticket_id, document) "
+            "VALUES (%s, %s, %s, to_tsvector(%s::regconfig, %s)) "
+            "ON CONFLICT (kind, object_id) DO UPDATE SET "
+            "ticket_id = EXCLUDED.ticket_id, document = EXCLUDED.document",
+            [kind, object_id, ticket_id, self.config, content or ""],
+        )
+
+    def remove(self, cursor, kind, object_ids):
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE kind = %s AND object_id = ANY(%s)",
+            [kind, list(object_ids)],
+        )
+
+    def search(self, cursor, text, limit):
+        if not _WORD_RE.search(text):
+            return []
+        cursor.execute(
+            f"SELECT ticket_id, MAX(ts_rank(document, query)) AS score "
+            f"FROM {TABLE}, websearch_to_tsquery(%s::regconfig, %s) query "
+            "WHERE document @@ query GROUP BY ticket_id ORDER BY score DESC LIMIT %s",
+            [self.config, text, limit],
+        )
+        return [(int(ticket_id), float(score)) for ticket_id, score in cursor.fetchall()]
+
+
+BACKENDS = {
+    "sqlite": SqliteBackend,
+    "postgresql": PostgresBackend,
+}
+
+
+def backend_for(conn):
+    return BACKENDS.get(conn.vendor, FallbackBackend)()
+
+
+def get_backend():
+    return backend_for(connection)
+
+
+def index_ticket(ticket):
+    with connection.cursor() as cursor:
+        get_backend().index(cursor, KIND_TICKET, ticket.pk, ticket.pk, ticket.title)
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        get_backend().index(cursor, KIND_POST, post.pk, post.ticket_id, post.message)
+
+
+def remove_ticket(ticket_id):
+    with connection.cursor() as cursor:
+        get_backend().remove(cursor, KIND_TICKET, [ticket_id])
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        get_backend().remove(cursor, KIND_POST, [post_id])
+
+
+def search(text, limit=None):
+    """Return ``[(ticket_id, score), ...]``, best match first."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    with metrics.timed("search.query"), connection.cursor() as cursor:
+        return get_backend().search(cursor, text, limit or max_results())
+
+
+def rebuild(chunk_size=2000):
+    """Drop and repopulate the search table. Returns the number of documents."""
+    backend = get_backend()
+    indexed = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.drop_schema(cursor)
+        backend.create_schema(cursor)
+        for pk, title in Ticket.objects.order_by().values_list(
+                "pk", "title").iterator(chunk_size=chunk_size):
+            backend.index(cursor, KIND_TICKET, pk, pk, title)
+            indexed += 1
+        for pk, ticket_id, message in TicketPost.objects.order_by().values_list(
+                "pk", "ticket_id", "message").iterator(chunk_size=chunk_size):
+            backend.index(cursor, KIND_POST, pk, ticket_id, message)
+            indexed += 1
+    return indexed
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import nltk
+from django.conf import settings
+
+from . import metrics, services, tasks
+from .models import TicketPost
+
+logger = logging.getLogger(__name__)
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def setup_nltk_data():
+    try:
+        nltk_data_dir = os.path.join(os.path.dirname(
+            os.path.dirname(__file__)), 'nltk_data')
+        if nltk_data_dir not in nltk.data.path:
+            nltk.data.path.append(nltk_data_dir)
+        logger.info("NLTK data path configured successfully")
+    except Exception as e:
+        logger.error(f"Error setting up NLTK data path: {str(e)}")
+        raise
+
+
+setup_nltk_data()
+
+
+def get_analyzer():
+    """Process-wide VADER analyzer; the lexicon is loaded on first use."""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                from nltk.sentiment import SentimentIntensityAnalyzer
+
+                with metrics.timed("sentiment.lexicon_load"):
+                    _analyzer = SentimentIntensityAnalyzer()
+                logger.info("VADER lexicon loaded")
+    return _analyzer
+
+
+def preload():
+    """Load the lexicon now instead of on the first scored post."""
+    get_analyzer()
+
+
+class ScoreCache:
+    """Thread-safe LRU of compound scores keyed by message digest."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+score_cache = ScoreCache(getattr(settings, "SENTIMENT_CACHE_SIZE", 1024))
+
+
+def compound_score(message):
+    key = hashlib.sha1(message.encode("utf-8")).hexdigest()
+    score = score_cache.get(key)
+    if score is not None:
+        metrics.observe("sentiment.cache_hit", 0.0)
+        return score
+
+    analyzer = get_analyzer()
+    with metrics.timed("sentiment.score"):
+        score = analyzer.polarity_scores(message)['compound']
+    score_cache.set(key, score)
+    return score
+
+
+def classify(score):
+    if score >= 0.05:
+        return 'Positive'
+    if score <= -0.05:
+        return 'Negative'
+    return 'Neutral'
+
+
+@tasks.task("sentiment.score_ticket")
+def score_ticket(ticket_id):
+    """Classify a ticket from its first post and store only the sentiment column."""
+    first_post = TicketPost.objects.filter(ticket_id=ticket_id).order_by(
+        "created", "id").only("message").first()
+    if first_post is None:
+        return
+
+    score = compound_score(first_post.message)
+    label = classify(score)
+    services.set_sentiment(ticket_id, label)
+
+    logger.info(
+        f"Sentiment analysis completed for Ticket #{ticket_id}: {label} (score: {score:.2f})")
+
+
+def schedule(ticket_id):
+    return tasks.enqueue(
+        "sentiment.score_ticket",
+        {"ticket_id": ticket_id},
+        dedupe_key=f"sentiment:{ticket_id}",
+    )
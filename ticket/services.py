@@ -0,0 +1,90 @@
+"""
+Ticket mutations shared by the HTML views, the REST API, bulk triage and
+background tasks.
+
+Writes are narrow conditional UPDATEs: only the column being changed (plus
+``updated``) is written, and only on rows that do not already hold the new
+value, so concurrent editors never overwrite each other's columns and a
+no-op change costs no write. QuerySet.update() bypasses model signals, so
+the caches the Ticket post_save receivers would refresh are refreshed here.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import dashboard, notifications
+from .models import Ticket
+
+# Sent with ``ticket_ids``, ``field`` and ``value`` after update_tickets
+# writes; stands in for the post_save that QuerySet.update() skips.
+tickets_changed = Signal()
+
+
+def update_tickets(ticket_ids, field, value, touch=True):
+    """
+    Set ``field`` to ``value`` on the tickets in ``ticket_ids`` that differ
+    and return the ids that were written. ``touch`` also bumps ``updated``.
+    """
+    changes = {field: value}
+    if touch:
+        changes["updated"] = timezone.now()
+    ticket_ids = list(ticket_ids)
+    pending = Ticket.objects.filter(pk__in=ticket_ids).exclude(**{field: value})
+
+    if field != "assigned" and len(ticket_ids) == 1:
+        # One row needs no read first: the UPDATE's row count says it all.
+        changed = ticket_ids if pending.update(**changes) else []
+        if changed:
+            tickets_changed.send(Ticket, ticket_ids=changed, field=field, value=value)
+        return changed
+    if field != "assigned":
+        with transaction.atomic():
+            changed = list(pending.order_by("pk").select_for_update()
+                           .values_list("pk", flat=True))
+            if changed:
+                Ticket.objects.filter(pk__in=changed).update(**changes)
+                tickets_changed.send(Ticket, ticket_ids=changed, field=field, value=value)
+        return changed
+
+    # Reassignment also needs the previous assignees, whose dashboard
+    # counts and recipient sets go stale. Both caches are cleared on commit.
+    with transaction.atomic():
+        rows = list(pending.order_by("pk").select_for_update()
+                    .values_list("pk", "assigned_id"))
+        changed = [pk for pk, _ in rows]
+        if changed:
+            Ticket.objects.filter(pk__in=changed).update(**changes)
+            notifications.invalidate_recipients(*changed)
+            dashboard.invalidate(getattr(value, "pk", value),
+                                 *(assigned_id for _, assigned_id in rows))
+            tickets_changed.send(Ticket, ticket_ids=changed, field=field, value=value)
+    return changed
+
+
+def assign_ticket(ticket_id, user):
+    """Assign the ticket to ``user``; returns False when it already was."""
+    return bool(update_tickets([ticket_id], "assigned", user))
+
+
+def transfer_ticket(ticket_id, department):
+    return bool(update_tickets([ticket_id], "department", department))
+
+
+def change_status(ticket_id, status):
+    return bool(update_tickets([ticket_id], "status", status))
+
+
+def set_sentiment(ticket_id, sentiment):
+    """Store a classification without touching ``updated`` or any other column."""
+    updated = Ticket.objects.filter(pk=ticket_id).exclude(
+        sentiment=sentiment).update(sentiment=sentiment)
+    return bool(updated)
+
+
+def toggle_follow(ticket, user):
+    """Follow or unfollow ``ticket`` for ``user``; returns True when now following."""
+    if ticket.followers.filter(pk=user.pk).exists():
+        ticket.followers.remove(user)
+        return False
+    ticket.followers.add(user)
+    return True
@@ -1,57 +1,200 @@
-import nltk
-from django.db.models.signals import post_save
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import TicketPost, Ticket
-from nltk.sentiment import SentimentIntensityAnalyzer
+from .models import TicketPost, Ticket, Status, Department, TicketType
+from . import dashboard, notifications, realtime, refdata, search, sentiment, services
+from django.db import transaction
 import logging
-import os
 
 logger = logging.getLogger(__name__)
 
 
-def setup_nltk_data():
-    try:
-        nltk_data_dir = os.path.join(os.path.dirname(
-            os.path.dirname(__file__)), 'nltk_data')
-        if nltk_data_dir not in nltk.data.path:
-            nltk.data.path.append(nltk_data_dir)
-        logger.info("NLTK data path configured successfully")
-    except Exception as e:
-        logger.error(f"Error setting up NLTK data path: {str(e)}")
-        raise
+@receiver(post_save, sender=TicketPost)
+def count_new_post(sender, instance, created, **kwargs):
+    # Registered before analyze_ticket_sentiment, which reads is_first_post.
+    if created:
+        instance.is_first_post = Ticket.objects.record_post(
+            instance.ticket_id, instance.created)
 
 
-setup_nltk_data()
+@receiver(post_delete, sender=TicketPost)
+def count_deleted_post(sender, instance, **kwargs):
+    latest = (
+        TicketPost.objects.filter(ticket=OuterRef("pk")).order_by()
+        .values("ticket").annotate(last=Max("created")).values("last")
+    )
+    Ticket.objects.filter(pk=instance.ticket_id, post_count__gt=0).update(
+        post_count=F("post_count") - 1, last_post_at=Subquery(latest))
 
 
 @receiver(post_save, sender=TicketPost)
 def analyze_ticket_sentiment(sender, instance, created, **kwargs):
+    """Queue sentiment scoring when a ticket receives its first post."""
     try:
-        if not created:
-            return
+        if created and getattr(instance, "is_first_post", False):
+            sentiment.schedule(instance.ticket_id)
+
+    except Exception as e:
+        logger.error(
+            f"Error queueing sentiment analysis for TicketPost {instance.id}: {str(e)}")
+
+
+@receiver(post_save, sender=Ticket)
+def invalidate_ticket_recipients(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is None or {"assigned", "created_by"} & set(update_fields):
+        notifications.invalidate_recipients(instance.pk)
+
+
+@receiver(m2m_changed, sender=Ticket.followers.through)
+def invalidate_follower_recipients(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            notifications.invalidate_recipients(instance.pk)
+    elif action in ("post_add", "post_remove"):
+        notifications.invalidate_recipients(*pk_set)
+    elif action == "pre_clear":
+        notifications.invalidate_recipients(
+            *instance.followed_tickets.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Ticket.followers.through)
+def count_followers(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        tickets = Ticket.objects.filter(pk=instance.pk)
+        if action == "post_add" and pk_set:
+            tickets.update(follower_count=F("follower_count") + len(pk_set))
+        elif action == "post_remove":
+            tickets.recount()
+        elif action == "post_clear":
+            tickets.update(follower_count=0)
+    elif action == "post_add" and pk_set:
+        Ticket.objects.filter(pk__in=pk_set).update(follower_count=F("follower_count") + 1)
+    elif action == "post_remove" and pk_set:
+        Ticket.objects.filter(pk__in=pk_set).recount()
+    elif action == "pre_clear":
+        # Every followed ticket loses exactly this one follower.
+        Ticket.objects.filter(followers=instance).update(
+            follower_count=F("follower_count") - 1)
+
+
+@receiver(pre_save, sender=Ticket)
+def invalidate_changed_dashboards(sender, instance, update_fields=None, **kwargs):
+    # The previous creator/assignee is only known before the write.
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {"assigned", "created_by"} & set(update_fields):
+        return
+    previous = Ticket.objects.filter(pk=instance.pk).values_list(
+        "created_by_id", "assigned_id").first()
+    current = (instance.created_by_id, instance.assigned_id)
+    if previous is not None and previous != current:
+        dashboard.invalidate(*previous, *current)
+
+
+@receiver(post_save, sender=Ticket)
+def invalidate_new_ticket_dashboards(sender, instance, created, **kwargs):
+    if created:
+        dashboard.invalidate(instance.created_by_id, instance.assigned_id)
+
+
+@receiver(pre_delete, sender=Ticket)
+def invalidate_deleted_ticket_dashboards(sender, instance, **kwargs):
+    # Follower rows are removed by the cascade without m2m_changed.
+    dashboard.invalidate(
+        instance.created_by_id, instance.assigned_id,
+        *instance.followers.values_list("pk", flat=True))
 
-        ticket = instance.ticket
 
-        if ticket.posts.count() == 1:
-            sia = SentimentIntensityAnalyzer()
+@receiver(m2m_changed, sender=Ticket.followers.through)
+def invalidate_follower_dashboards(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            dashboard.invalidate(instance.pk)
+    elif action in ("post_add", "post_remove") and pk_set:
+        dashboard.invalidate(*pk_set)
+    elif action == "pre_clear":
+        dashboard.invalidate(*instance.followers.values_list("pk", flat=True))
 
-            sentiment_scores = sia.polarity_scores(instance.message)
 
-            compound_score = sentiment_scores['compound']
+@receiver(post_save, sender=TicketPost)
+def broadcast_new_post(sender, instance, created, **kwargs):
+    if created:
+        realtime.broadcast(
+            {"type": "post.created", "ticket": instance.ticket_id, "post": instance.pk,
+             "user": getattr(instance.user, "username", None), "private": instance.private},
+            instance.ticket_id, instance.ticket.department_id)
+
+
+@receiver(post_save, sender=Ticket)
+def broadcast_new_ticket(sender, instance, created, **kwargs):
+    if created:
+        realtime.broadcast(
+            {"type": "ticket.created", "ticket": instance.pk},
+            instance.pk, instance.department_id)
+
+
+TICKET_EVENTS = {
+    "assigned": "ticket.assigned",
+    "status": "ticket.status",
+    "department": "ticket.transferred",
+}
 
-            if compound_score >= 0.05:
-                sentiment = 'Positive'
-            elif compound_score <= -0.05:
-                sentiment = 'Negative'
-            else:
-                sentiment = 'Neutral'
 
-            ticket.sentiment = sentiment
-            ticket.save()
+@receiver(services.tickets_changed)
+def broadcast_ticket_changes(sender, ticket_ids, field, value, **kwargs):
+    if field not in TICKET_EVENTS:
+        return
+    if field == "department":
+        departments = dict.fromkeys(ticket_ids, getattr(value, "pk", None))
+    else:
+        departments = dict(Ticket.objects.filter(
+            pk__in=ticket_ids).values_list("pk", "department_id"))
+    for ticket_id in ticket_ids:
+        realtime.broadcast(
+            {"type": TICKET_EVENTS[field], "ticket": ticket_id,
+             "value": getattr(value, "pk", value),
+             "label": None if value is None else str(value)},
+            ticket_id, departments.get(ticket_id))
 
-            logger.info(
-                f"Sentiment analysis completed for Ticket #{ticket.id}: {sentiment} (score: {compound_score:.2f})")
 
+@receiver([post_save, post_delete], sender=Status)
+@receiver([post_save, post_delete], sender=Department)
+@receiver([post_save, post_delete], sender=TicketType)
+def invalidate_reference_data(sender, **kwargs):
+    # Bumped before the commit, the new version could be filled with the
+    # old rows by a concurrent request and served until the next change.
+    transaction.on_commit(refdata.invalidate)
+
+
+def _update_search_index(func, *args):
+    # A savepoint keeps a search-index failure from aborting the caller's
+    # transaction (PostgreSQL) while the ticket write itself still succeeds.
+    try:
+        with transaction.atomic():
+            func(*args)
     except Exception as e:
-        logger.error(
-            f"Error in sentiment analysis for TicketPost {instance.id}: {str(e)}")
+        logger.error(f"Error updating search index via {func.__name__}: {str(e)}")
+
+
+@receiver(post_save, sender=Ticket)
+def index_ticket_title(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or "title" in update_fields:
+        _update_search_index(search.index_ticket, instance)
+
+
+@receiver(post_save, sender=TicketPost)
+def index_post_message(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or "message" in update_fields:
+        _update_search_index(search.index_post, instance)
+
+
+@receiver(post_delete, sender=Ticket)
+def remove_ticket_from_search(sender, instance, **kwargs):
+    _update_search_index(search.remove_ticket, instance.pk)
+
+
+@receiver(post_delete, sender=TicketPost)
+def remove_post_from_search(sender, instance, **kwargs):
+    _update_search_index(search.remove_post, instance.pk)
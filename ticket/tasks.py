@@ -0,0 +1,174 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+# Names of the tasks being run inline by eager enqueue() on this thread.
+_eager = threading.local()
+
+# Seconds a claimed task may run before another worker may reclaim it.
+LEASE_SECONDS = 300
+RETRY_BASE_SECONDS = 5
+
+
+def task(name, max_attempts=5):
+    """Register a function as a background task under ``name``."""
+    def decorator(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def registered_tasks():
+    return dict(_registry)
+
+
+def enqueue(name, payload=None, dedupe_key=None, delay=0):
+    """
+    Queue ``name`` to run with ``payload`` as keyword arguments.
+
+    While a task with the same ``dedupe_key`` is pending or running, further
+    enqueues are dropped and the existing task is returned.
+    """
+    if name not in _registry:
+        raise KeyError(f"Unknown background task: {name}")
+    payload = payload or {}
+
+    if getattr(settings, "TICKET_TASKS_EAGER", False):
+        running = _eager.__dict__.setdefault("running", set())
+        # A task re-queueing itself (e.g. to retry later) would otherwise
+        # run again inline and recurse; it waits for the next enqueue.
+        if name not in running:
+            running.add(name)
+            try:
+                _registry[name](**payload)
+            finally:
+                running.discard(name)
+        return None
+
+    fields = {
+        "name": name,
+        "payload": payload,
+        "max_attempts": _registry[name].max_attempts,
+        "run_after": timezone.now() + timedelta(seconds=delay),
+    }
+    if dedupe_key is None:
+        return BackgroundTask.objects.create(**fields)
+
+    active = [BackgroundTask.State.PENDING, BackgroundTask.State.RUNNING]
+    existing = BackgroundTask.objects.filter(
+        dedupe_key=dedupe_key, state__in=active).first()
+    if existing is not None:
+        return existing
+    try:
+        with transaction.atomic():
+            return BackgroundTask.objects.create(dedupe_key=dedupe_key, **fields)
+    except IntegrityError:
+        return BackgroundTask.objects.filter(
+            dedupe_key=dedupe_key, state__in=active).first()
+
+
+def requeue_expired():
+    """
+    Return tasks whose worker lease ran out to the pending state. A task
+    that has used up its attempts (it keeps taking its worker down with it)
+    is marked failed instead of being retried forever.
+    """
+    expired = BackgroundTask.objects.filter(
+        state=BackgroundTask.State.RUNNING,
+        locked_until__lt=timezone.now(),
+    )
+    failed = expired.filter(attempts__gte=F("max_attempts")).update(
+        state=BackgroundTask.State.FAILED, locked_until=None,
+        last_error="Worker lease expired on the final attempt",
+        updated=timezone.now())
+    if failed:
+        logger.error(f"{failed} task(s) failed permanently after their lease expired")
+    return expired.update(state=BackgroundTask.State.PENDING, locked_until=None)
+
+
+def claim(batch_size):
+    """
+    Claim up to ``batch_size`` due tasks. Each claim is a conditional
+    UPDATE on the pending state, so concurrent workers never run the same
+    task even on databases without ``SELECT ... FOR UPDATE``.
+    """
+    now = timezone.now()
+    candidates = BackgroundTask.objects.filter(
+        state=BackgroundTask.State.PENDING, run_after__lte=now,
+        attempts__lt=F("max_attempts"),
+    ).order_by("run_after", "id").values_list("id", flat=True)[:batch_size]
+
+    claimed = []
+    for task_id in candidates:
+        updated = BackgroundTask.objects.filter(
+            id=task_id, state=BackgroundTask.State.PENDING,
+        ).update(
+            state=BackgroundTask.State.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_until=now + timedelta(seconds=LEASE_SECONDS),
+        )
+        if updated:
+            claimed.append(task_id)
+    return list(BackgroundTask.objects.filter(id__in=claimed))
+
+
+def execute(background_task):
+    func = _registry.get(background_task.name)
+    try:
+        if func is None:
+            raise KeyError(f"Unknown background task: {background_task.name}")
+        func(**background_task.payload)
+    except Exception as e:
+        _record_failure(background_task, e)
+        return False
+
+    BackgroundTask.objects.filter(id=background_task.id).update(
+        state=BackgroundTask.State.DONE, locked_until=None, last_error="",
+        updated=timezone.now())
+    return True
+
+
+def _record_failure(background_task, error):
+    if background_task.attempts >= background_task.max_attempts:
+        state = BackgroundTask.State.FAILED
+        run_after = background_task.run_after
+        logger.error(
+            f"Task {background_task.name} #{background_task.id} failed permanently: {str(error)}")
+    else:
+        state = BackgroundTask.State.PENDING
+        backoff = RETRY_BASE_SECONDS * 2 ** (background_task.attempts - 1)
+        run_after = timezone.now() + timedelta(seconds=backoff)
+        logger.warning(
+            f"Task {background_task.name} #{background_task.id} failed, retrying in {backoff}s: {str(error)}")
+
+    BackgroundTask.objects.filter(id=background_task.id).update(
+        state=state, run_after=run_after, locked_until=None,
+        last_error=str(error), updated=timezone.now())
+
+
+def run_pending(batch_size=20):
+    """Claim and run one batch. Returns the number of tasks processed."""
+    requeue_expired()
+    batch = claim(batch_size)
+    for background_task in batch:
+        execute(background_task)
+    return len(batch)
+
+
+def purge_finished(older_than):
+    cutoff = timezone.now() - older_than
+    deleted, _ = BackgroundTask.objects.filter(
+        state=BackgroundTask.State.DONE, updated__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,1071 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import json
+import re
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.mail.backends import locmem
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    bulk, dashboard, notifications, realtime, refdata, search, sentiment, services, tasks,
+)
+from .management.commands.run_workers import Command as RunWorkersCommand
+from .pagination import CursorPaginator, keyset_filter
+from .models import (
+    BackgroundTask, Department, NotificationOutbox, Status, Ticket, TicketPost, TicketType,
+)
+
+
+class TicketFixtureMixin:
+    """Reference data, two users and helpers to create tickets with posts and followers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.open = Status.objects.create(status="Open")
+        cls.closed = Status.objects.create(status="Closed")
+        cls.support = Department.objects.create(department="Support", desciption="")
+        cls.billing = Department.objects.create(department="Billing", desciption="")
+        cls.incident = TicketType.objects.create(type="Incident", desciption="")
+        cls.alice = User.objects.create_user("alice", "alice@example.com", "pw")
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "pw")
+
+    def setUp(self):
+        cache.clear()
+        refdata.invalidate()
+
+    def make_ticket(self, title="Printer is not working", posts=1, followers=(), **fields):
+        fields.setdefault("created_by", self.alice)
+        fields.setdefault("assigned", self.bob)
+        fields.setdefault("status", self.open)
+        fields.setdefault("department", self.support)
+        fields.setdefault("type", self.incident)
+        ticket = Ticket.objects.create(title=title, **fields)
+        for n in range(posts):
+            TicketPost.objects.create(ticket=ticket, user=fields["created_by"],
+                                      message=f"Reply {n} about {title}")
+        if followers:
+            ticket.followers.add(*followers)
+        return ticket
+
+
+class QueryBudgetMixin(TicketFixtureMixin):
+    """
+    Listing and detail pages must cost a fixed number of queries, however
+    many rows, posts or followers they show.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+
+    def count_queries(self, url, data=None):
+        # Lookup tables are cached per process by design; load them up front
+        # so only the page's own queries are counted.
+        refdata.statuses(), refdata.departments(), refdata.ticket_types()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, data or {})
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def assertQueryBudget(self, url, budget, data=None, grow=None):
+        """
+        ``url`` stays within ``budget`` queries, and the count does not
+        change after ``grow()`` adds more content to the page.
+        """
+        grow = grow or (lambda: [self.make_ticket(f"Extra {n}", posts=2,
+                                                  followers=[self.alice, self.bob])
+                                 for n in range(8)])
+        self.make_ticket(followers=[self.alice])
+        cache.clear()
+        small = self.count_queries(url, data)
+        grow()
+        cache.clear()
+        large = self.count_queries(url, data)
+        self.assertEqual(small, large, f"{url} queries grow with the page size")
+        self.assertLessEqual(large, budget)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def test_index(self):
+        self.assertQueryBudget(reverse("index"), 4)
+
+    def test_index_filtered(self):
+        self.assertQueryBudget(reverse("index"), 4, {"status": self.open.pk})
+
+    def test_index_filtered_by_user(self):
+        self.assertQueryBudget(reverse("index"), 6, {"created_by": self.alice.pk})
+
+    def test_my_tickets(self):
+        for tab in ("created", "assigned", "followed"):
+            with self.subTest(tab=tab):
+                self.assertQueryBudget(reverse("my_tickets"), 5, {"filter": tab})
+
+    def test_view_ticket(self):
+        ticket = self.make_ticket(posts=1)
+
+        def grow():
+            for n in range(15):
+                TicketPost.objects.create(ticket=ticket, user=self.alice, message=f"More {n}")
+            ticket.followers.add(self.alice)
+
+        self.assertQueryBudget(reverse("view_ticket", args=[ticket.pk]), 6, grow=grow)
+
+
+class CursorPaginatorTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        tickets = [self.make_ticket(f"Ticket {n}", posts=0) for n in range(7)]
+        # Three tickets share one timestamp and two another, so pages have
+        # to break ties on id.
+        stamps = [now, now, now, now - timedelta(hours=1), now - timedelta(hours=1),
+                  now - timedelta(hours=2), now - timedelta(hours=3)]
+        for ticket, stamp in zip(tickets, stamps):
+            Ticket.objects.filter(pk=ticket.pk).update(updated=stamp)
+        self.expected = list(Ticket.objects.order_by("-updated", "-id").values_list("pk", flat=True))
+
+    def walk(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_forward_and_back_across_ties(self):
+        paginator = CursorPaginator(Ticket.objects.all(), 2)
+        pages = self.walk(paginator)
+        self.assertEqual([t.pk for page in pages for t in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        back = []
+        page = pages[-1]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            back.append([t.pk for t in page])
+        self.assertEqual(back, [[t.pk for t in page] for page in reversed(pages[:-1])])
+
+    def test_ascending(self):
+        pages = self.walk(CursorPaginator(Ticket.objects.all(), 3, descending=False))
+        self.assertEqual([t.pk for page in pages for t in page], self.expected[::-1])
+
+    def test_invalid_cursor_starts_over(self):
+        page = CursorPaginator(Ticket.objects.all(), 2).page("not-a-cursor")
+        self.assertEqual([t.pk for t in page], self.expected[:2])
+
+    def test_keyset_filter_bounds_the_leading_column(self):
+        ticket = Ticket.objects.get(pk=self.expected[1])
+        condition = keyset_filter(("updated", "id"), (ticket.updated, ticket.pk), True)
+        sql = str(Ticket.objects.filter(condition).query)
+        self.assertIn('"updated" <=', sql)
+        rest = Ticket.objects.filter(condition).order_by("-updated", "-id")
+        self.assertEqual(list(rest.values_list("pk", flat=True)), self.expected[2:])
+
+
+calls = []
+
+
+@tasks.task("tests.record", max_attempts=2)
+def record_task(value):
+    calls.append(value)
+
+
+@tasks.task("tests.fail", max_attempts=2)
+def failing_task():
+    raise RuntimeError("boom")
+
+
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_deduplicates_active_tasks(self):
+        first = tasks.enqueue("tests.record", {"value": 1}, dedupe_key="k")
+        second = tasks.enqueue("tests.record", {"value": 2}, dedupe_key="k")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(calls, [1])
+        # Finished tasks no longer block the key.
+        self.assertNotEqual(tasks.enqueue("tests.record", {"value": 3}, dedupe_key="k").pk,
+                            first.pk)
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        task = tasks.enqueue("tests.fail")
+        tasks.run_pending()
+        task.refresh_from_db()
+        self.assertEqual((task.state, task.attempts), (BackgroundTask.State.PENDING, 1))
+        self.assertGreater(task.run_after, timezone.now())
+
+        BackgroundTask.objects.filter(pk=task.pk).update(run_after=timezone.now())
+        tasks.run_pending()
+        task.refresh_from_db()
+        self.assertEqual(task.state, BackgroundTask.State.FAILED)
+        self.assertIn("boom", task.last_error)
+
+    def test_expired_lease_is_requeued_until_attempts_run_out(self):
+        task = tasks.enqueue("tests.record", {"value": 1})
+        expired = timezone.now() - timedelta(seconds=1)
+        BackgroundTask.objects.filter(pk=task.pk).update(
+            state=BackgroundTask.State.RUNNING, attempts=1, locked_until=expired)
+        self.assertEqual(tasks.requeue_expired(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.state, BackgroundTask.State.PENDING)
+
+        # A task that crashed its worker on the last attempt is not retried.
+        BackgroundTask.objects.filter(pk=task.pk).update(
+            state=BackgroundTask.State.RUNNING, attempts=2, locked_until=expired)
+        self.assertEqual(tasks.run_pending(), 0)
+        task.refresh_from_db()
+        self.assertEqual(task.state, BackgroundTask.State.FAILED)
+        self.assertEqual(calls, [])
+
+    def test_claim_skips_exhausted_tasks(self):
+        task = tasks.enqueue("tests.record", {"value": 1})
+        BackgroundTask.objects.filter(pk=task.pk).update(attempts=2)
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_worker_survives_queue_errors(self):
+        command = RunWorkersCommand()
+        command.stopping = threading.Event()
+        results = iter([RuntimeError("database is locked"), 1, 0])
+
+        def run_pending(batch_size):
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        # The worker closes its thread's connection, which here is the test's.
+        with mock.patch.object(tasks, "run_pending", side_effect=run_pending) as run, \
+                mock.patch("ticket.management.commands.run_workers.connection"), \
+                self.assertLogs("ticket.management.commands.run_workers", "ERROR"):
+            command.work({"batch_size": 5, "sleep": 0, "once": True})
+        self.assertEqual(run.call_count, 3)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP unavailable")
+
+
+class ConcurrentDispatchEmailBackend(locmem.EmailBackend):
+    """Starts a second dispatcher while the first one is sending."""
+    nested = False
+
+    def send_messages(self, email_messages):
+        if not ConcurrentDispatchEmailBackend.nested:
+            ConcurrentDispatchEmailBackend.nested = True
+            notifications.dispatch()
+        return super().send_messages(email_messages)
+
+
+class NotificationTests(TicketFixtureMixin, TestCase):
+    """Posts queue outbox rows; the dispatcher sends them through the locmem backend."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.carol = User.objects.create_user("carol", "carol@example.com", "pw", is_staff=True)
+        cls.dave = User.objects.create_user("dave", "", "pw")
+
+    def setUp(self):
+        super().setUp()
+        self.ticket = self.make_ticket(posts=0, followers=[self.carol, self.dave])
+        self.client.force_login(self.alice)
+
+    def reply(self, message, private=False):
+        data = {"message": message}
+        if private:
+            data["private"] = "on"
+        response = self.client.post(reverse("view_ticket", args=[self.ticket.pk]), data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_reply_notifies_everyone_but_the_author(self):
+        self.reply("Restarted the spooler")
+        self.assertEqual(mail.outbox, [])
+
+        notifications.dispatch()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ["bob@example.com", "carol@example.com"])
+        self.assertIn("Restarted the spooler", mail.outbox[0].body)
+        self.assertEqual(set(NotificationOutbox.objects.values_list("state", flat=True)),
+                         {NotificationOutbox.State.SENT})
+
+    def test_replies_in_one_window_are_one_digest(self):
+        self.reply("First")
+        self.reply("Second")
+        notifications.dispatch()
+        self.assertEqual(len(mail.outbox), 2)
+        for message in mail.outbox:
+            self.assertIn("(2 new responses)", message.subject)
+            self.assertIn("First", message.body)
+            self.assertIn("Second", message.body)
+
+    def test_private_reply_only_reaches_staff(self):
+        self.reply("Internal note", private=True)
+        notifications.dispatch()
+        self.assertEqual([m.to for m in mail.outbox], [["carol@example.com"]])
+
+    def test_unfollowed_user_is_not_notified(self):
+        self.reply("First")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.followers.remove(self.carol)
+        self.reply("Second")
+        notifications.dispatch()
+        carol = [m for m in mail.outbox if m.to == ["carol@example.com"]]
+        self.assertEqual(len(carol), 1)
+        self.assertNotIn("Second", carol[0].body)
+
+    def test_recipient_cache_is_dropped_on_commit(self):
+        key = notifications.recipient_cache_key(self.ticket.pk)
+        notifications.resolve_recipients(self.ticket.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            services.assign_ticket(self.ticket.pk, self.dave)
+            self.assertIsNotNone(cache.get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+        self.assertNotIn(self.bob.pk, notifications.resolve_recipients(self.ticket.pk))
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                       "LOCATION": "shared"},
+        },
+        NOTIFICATION_CACHE_ALIAS="shared",
+    )
+    def test_recipient_cache_alias(self):
+        notifications.resolve_recipients(self.ticket.pk)
+        key = notifications.recipient_cache_key(self.ticket.pk)
+        self.assertIsNone(caches["default"].get(key))
+        self.assertIsNotNone(caches["shared"].get(key))
+
+    @override_settings(EMAIL_BACKEND="ticket.tests.FailingEmailBackend")
+    def test_failed_send_is_retried_later(self):
+        self.reply("First")
+        with self.assertLogs("ticket.notifications", "ERROR"):
+            notifications.dispatch()
+        entries = NotificationOutbox.objects.all()
+        self.assertTrue(all(e.state == NotificationOutbox.State.PENDING for e in entries))
+        self.assertTrue(all(e.attempts == 1 and e.next_attempt_at > timezone.now()
+                            for e in entries))
+        self.assertIn("SMTP unavailable", entries[0].last_error)
+
+    @override_settings(EMAIL_BACKEND="ticket.tests.ConcurrentDispatchEmailBackend")
+    def test_concurrent_dispatchers_send_once(self):
+        self.reply("First")
+        ConcurrentDispatchEmailBackend.nested = False
+        notifications.dispatch()
+        self.assertTrue(ConcurrentDispatchEmailBackend.nested)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ["bob@example.com", "carol@example.com"])
+        self.assertEqual(set(NotificationOutbox.objects.values_list("state", flat=True)),
+                         {NotificationOutbox.State.SENT})
+
+    def test_expired_claim_is_sent_again(self):
+        self.reply("First")
+        NotificationOutbox.objects.update(
+            state=NotificationOutbox.State.SENDING, claimed_by="dead",
+            next_attempt_at=timezone.now() + timedelta(minutes=1))
+        notifications.dispatch()
+        self.assertEqual(mail.outbox, [])
+
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+        notifications.dispatch()
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(TICKET_TASKS_EAGER=1, EMAIL_BACKEND="ticket.tests.FailingEmailBackend")
+    def test_eager_failed_send_does_not_recurse(self):
+        # The failed rows are due again later; the eager dispatcher must not
+        # keep re-running itself inline until then.
+        with self.assertLogs("ticket.notifications", "ERROR"):
+            self.reply("First")
+        self.assertEqual(set(NotificationOutbox.objects.values_list("state", "attempts")),
+                         {(NotificationOutbox.State.PENDING, 1)})
+
+        with self.settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+            NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+            self.reply("Second")
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class ConditionalGetTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+        self.ticket = self.make_ticket(followers=[self.alice])
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_changes_that_leave_timestamps_alone(self):
+        urls = (f"/api/tickets/{self.ticket.pk}/", "/api/tickets/",
+                reverse("view_ticket", args=[self.ticket.pk]))
+        sentiments = iter(["Negative", "Positive", "Neutral"])
+        changes = {
+            "follower": lambda: self.ticket.followers.add(self.bob),
+            "sentiment": lambda: services.set_sentiment(self.ticket.pk, next(sentiments)),
+            "rename": lambda: Status.objects.get(pk=self.open.pk).save(),
+            "post edit": lambda: self.ticket.posts.get().save(),
+            "user rename": lambda: User.objects.filter(pk=self.alice.pk).update(
+                username=f"alice-{timezone.now().timestamp()}"),
+        }
+        for url in urls:
+            for name, change in changes.items():
+                with self.subTest(url=url, change=name):
+                    self.assertRevalidates(url, change)
+                    self.ticket.followers.remove(self.bob)
+
+    def test_list_drops_deleted_ticket(self):
+        other = self.make_ticket("Other")
+        self.assertRevalidates("/api/tickets/", other.delete)
+
+    def test_view_ticket_scoped_to_follow_state(self):
+        # Same follower count either side, only bob's follow state differs.
+        url = reverse("view_ticket", args=[self.ticket.pk])
+
+        def swap():
+            self.ticket.followers.remove(self.alice)
+            self.ticket.followers.add(self.bob)
+
+        self.assertRevalidates(url, swap)
+        self.assertContains(self.client.get(url), "Unfollow")
+
+
+@mock.patch("ticket.views.THREAD_PAGE_SIZE", 3)
+class ThreadPagingTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+        self.ticket = self.make_ticket(posts=8)
+        # Five posts share one timestamp, so pages have to break ties on id.
+        posts = list(self.ticket.posts.order_by("id"))
+        base = timezone.now() - timedelta(hours=1)
+        stamps = [base, base + timedelta(minutes=1)] + [base + timedelta(minutes=2)] * 5 + [
+            base + timedelta(minutes=3)]
+        for post, stamp in zip(posts, stamps):
+            TicketPost.objects.filter(pk=post.pk).update(created=stamp)
+        self.expected = list(self.ticket.posts.order_by("created", "id").values_list("pk", flat=True))
+
+    def fetch(self, **params):
+        response = self.client.get(reverse("ticket_posts", args=[self.ticket.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        ids = [int(pk) for pk in re.findall(r'data-post-id="(\d+)"', data["html"])]
+        return ids, data
+
+    def test_first_page_is_newest(self):
+        response = self.client.get(reverse("view_ticket", args=[self.ticket.pk]))
+        self.assertEqual([post.pk for post in response.context["posts"]], self.expected[-3:])
+        self.assertTrue(response.context["has_older_posts"])
+
+    def test_before_walks_back_to_the_first_post(self):
+        seen, before = [], self.expected[-3]
+        while before is not None:
+            ids, data = self.fetch(before=before)
+            seen = ids + seen
+            before = data["before"]
+        self.assertEqual(seen, self.expected[:-3])
+
+    def test_after_walks_forward_to_the_newest_post(self):
+        seen, after = [], self.expected[0]
+        while after is not None:
+            ids, data = self.fetch(after=after)
+            seen += ids
+            after = data["after"]
+        self.assertEqual(seen, self.expected[1:])
+
+    def test_bad_requests(self):
+        other = self.make_ticket("Other")
+        url = reverse("ticket_posts", args=[self.ticket.pk])
+        for params in ({}, {"before": "x"}, {"after": ""}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+        foreign = other.posts.get().pk
+        self.assertEqual(self.client.get(url, {"before": foreign}).status_code, 404)
+        for pk in (999999, "abc"):
+            with self.subTest(ticket=pk):
+                response = self.client.get(reverse("ticket_posts", args=[pk]),
+                                           {"before": self.expected[0]})
+                self.assertEqual(response.status_code, 404)
+
+
+class FakeSocket:
+    """Drives ``realtime.websocket_application`` the way an ASGI server would."""
+
+    def __init__(self, path, query="", headers=()):
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        scope = {"type": "websocket", "path": path, "query_string": query.encode(),
+                 "headers": [(name.encode(), value.encode()) for name, value in headers]}
+        self.task = asyncio.create_task(realtime.websocket_application(
+            scope, self.incoming.get, self.outgoing.put))
+
+    async def connect(self):
+        await self.incoming.put({"type": "websocket.connect"})
+        return (await self.receive())["type"]
+
+    async def receive(self, timeout=1):
+        return await asyncio.wait_for(self.outgoing.get(), timeout)
+
+    async def close(self):
+        await self.incoming.put({"type": "websocket.disconnect"})
+        await asyncio.wait_for(self.task, 1)
+
+
+@override_settings(ALLOWED_HOSTS=["tickets.example"])
+class RealtimeTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ticket = self.make_ticket(posts=0)
+        self.path = f"/ws/tickets/{self.ticket.pk}/"
+
+    async def session_cookie(self):
+        await self.async_client.aforce_login(self.bob)
+        return ("cookie", f"{settings.SESSION_COOKIE_NAME}="
+                          f"{self.async_client.cookies[settings.SESSION_COOKIE_NAME].value}")
+
+    async def test_session_and_jwt_sockets_are_accepted(self):
+        token = RefreshToken.for_user(self.bob).access_token
+        for socket in (FakeSocket(self.path, headers=[await self.session_cookie()]),
+                       FakeSocket(self.path, query=f"token={token}")):
+            self.assertEqual(await socket.connect(), "websocket.accept")
+            await socket.close()
+
+    async def test_anonymous_and_bad_sockets_are_refused(self):
+        cookie = await self.session_cookie()
+        sockets = {
+            "anonymous": FakeSocket(self.path),
+            "bad token": FakeSocket(self.path, query="token=nope"),
+            "bad session": FakeSocket(self.path, headers=[("cookie", "sessionid=nope")]),
+            "foreign origin": FakeSocket(self.path, headers=[
+                cookie, ("origin", "https://evil.example")]),
+            "no groups": FakeSocket("/ws/departments/", headers=[cookie]),
+        }
+        for name, socket in sockets.items():
+            with self.subTest(name):
+                await socket.incoming.put({"type": "websocket.connect"})
+                self.assertEqual(await socket.receive(),
+                                 {"type": "websocket.close", "code": realtime.CLOSE_FORBIDDEN})
+                await asyncio.wait_for(socket.task, 1)
+
+        socket = FakeSocket(self.path, headers=[cookie, ("origin", "https://tickets.example")])
+        self.assertEqual(await socket.connect(), "websocket.accept")
+        await socket.close()
+
+    async def test_events_are_sent_after_commit(self):
+        cookie = await self.session_cookie()
+        socket = FakeSocket(self.path, headers=[cookie])
+        other = FakeSocket("/ws/departments/", query=f"department={self.billing.pk}",
+                           headers=[cookie])
+        self.assertEqual(await socket.connect(), "websocket.accept")
+        self.assertEqual(await other.connect(), "websocket.accept")
+
+        def close_ticket():
+            with self.captureOnCommitCallbacks() as callbacks:
+                services.change_status(self.ticket.pk, self.closed)
+            return callbacks
+
+        callbacks = await sync_to_async(close_ticket)()
+        with self.assertRaises(asyncio.TimeoutError):
+            await socket.receive(timeout=0.1)
+        for callback in callbacks:
+            callback()
+
+        message = await socket.receive()
+        self.assertEqual(json.loads(message["text"]), {
+            "type": "ticket.status", "ticket": self.ticket.pk,
+            "value": self.closed.pk, "label": "Closed"})
+        # The ticket is in Support, so the Billing subscriber hears nothing.
+        with self.assertRaises(asyncio.TimeoutError):
+            await other.receive(timeout=0.1)
+        await socket.close()
+        await other.close()
+
+
+class CounterTests(TicketFixtureMixin, TestCase):
+    """The denormalized post/follower counters follow every kind of write."""
+
+    def counts(self, ticket):
+        return Ticket.objects.filter(pk=ticket.pk).values_list(
+            "post_count", "last_post_at", "follower_count").get()
+
+    def test_posts(self):
+        ticket = self.make_ticket(posts=0)
+        self.assertEqual(self.counts(ticket), (0, None, 0))
+        first = TicketPost.objects.create(ticket=ticket, user=self.alice, message="First")
+        second = TicketPost.objects.create(ticket=ticket, user=self.bob, message="Second")
+        self.assertEqual(self.counts(ticket), (2, second.created, 0))
+
+        second.delete()
+        self.assertEqual(self.counts(ticket), (1, first.created, 0))
+        first.delete()
+        self.assertEqual(self.counts(ticket), (0, None, 0))
+
+    def test_followers_from_the_ticket(self):
+        ticket = self.make_ticket()
+        ticket.followers.add(self.alice, self.bob)
+        self.assertEqual(self.counts(ticket)[2], 2)
+        ticket.followers.add(self.bob)
+        ticket.followers.remove(self.alice)
+        self.assertEqual(self.counts(ticket)[2], 1)
+        ticket.followers.clear()
+        self.assertEqual(self.counts(ticket)[2], 0)
+
+    def test_followers_from_the_user(self):
+        first, second = self.make_ticket("First"), self.make_ticket("Second")
+        first.followers.add(self.alice)
+        self.bob.followed_tickets.add(first, second)
+        self.assertEqual([self.counts(t)[2] for t in (first, second)], [2, 1])
+        self.bob.followed_tickets.remove(second)
+        self.assertEqual([self.counts(t)[2] for t in (first, second)], [2, 0])
+        self.bob.followed_tickets.add(second)
+        self.bob.followed_tickets.clear()
+        self.assertEqual([self.counts(t)[2] for t in (first, second)], [1, 0])
+
+    def test_recount_command_repairs_drift(self):
+        tickets = [self.make_ticket(f"Ticket {n}", posts=n, followers=[self.alice])
+                   for n in range(3)]
+        expected = [self.counts(t) for t in tickets]
+        Ticket.objects.update(post_count=99, last_post_at=None, follower_count=7)
+
+        call_command("recount_tickets", ticket=[tickets[0].pk], stdout=io.StringIO())
+        self.assertEqual(self.counts(tickets[0]), expected[0])
+        self.assertEqual(self.counts(tickets[1])[0], 99)
+
+        call_command("recount_tickets", batch_size=1, stdout=io.StringIO())
+        self.assertEqual([self.counts(t) for t in tickets], expected)
+
+
+class SentimentTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.analyzer = mock.Mock()
+        self.analyzer.polarity_scores.side_effect = lambda text: {"compound": len(text) / 100}
+        patches = [
+            mock.patch.object(sentiment, "get_analyzer", return_value=self.analyzer),
+            mock.patch.object(sentiment, "score_cache", sentiment.ScoreCache(2)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_repeated_text_is_scored_once(self):
+        self.assertEqual(sentiment.compound_score("Printer on fire"), 0.15)
+        self.assertEqual(sentiment.compound_score("Printer on fire"), 0.15)
+        self.assertEqual(self.analyzer.polarity_scores.call_count, 1)
+
+    def test_least_recently_used_is_evicted(self):
+        for text in ("a", "bb", "a", "ccc"):
+            sentiment.compound_score(text)
+        # "bb" was the least recently used when "ccc" arrived at capacity.
+        self.analyzer.polarity_scores.reset_mock()
+        sentiment.compound_score("a")
+        sentiment.compound_score("ccc")
+        self.analyzer.polarity_scores.assert_not_called()
+        sentiment.compound_score("bb")
+        self.analyzer.polarity_scores.assert_called_once_with("bb")
+
+    def test_score_ticket_stores_only_the_label(self):
+        ticket = self.make_ticket(posts=0)
+        TicketPost.objects.create(ticket=ticket, user=self.alice, message="x" * 10)
+        stamp = Ticket.objects.get(pk=ticket.pk).updated
+        sentiment.score_ticket(ticket.pk)
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        self.assertEqual((ticket.sentiment, ticket.updated), ("Positive", stamp))
+
+
+class RefdataTests(TicketFixtureMixin, TestCase):
+
+    def test_lookups_are_cached(self):
+        refdata.statuses()
+        with self.assertNumQueries(0):
+            self.assertEqual([s.status for s in refdata.statuses()], ["Open", "Closed"])
+            self.assertEqual(refdata.get(Status, self.closed.pk).status, "Closed")
+
+    def test_rename_invalidates_after_commit(self):
+        refdata.statuses()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Status.objects.filter(pk=self.open.pk).update(status="New")
+            Status.objects.get(pk=self.open.pk).save()
+            # Still the committed snapshot until the transaction commits.
+            self.assertEqual(refdata.get(Status, self.open.pk).status, "Open")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(refdata.get(Status, self.open.pk).status, "New")
+
+    @override_settings(REFDATA_CACHE_TTL=60)
+    def test_local_version_expires(self):
+        # A rename committed by another process (no signal runs here).
+        refdata.statuses()
+        version = refdata.current_version()
+        Status.objects.filter(pk=self.open.pk).update(status="New")
+        self.assertEqual(refdata.get(Status, self.open.pk).status, "Open")
+
+        with mock.patch("ticket.refdata.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertNotEqual(refdata.current_version(), version)
+            self.assertEqual(refdata.get(Status, self.open.pk).status, "New")
+
+    def test_get_or_404(self):
+        with self.assertRaises(Http404):
+            refdata.get_or_404(Status, "nope")
+        with self.assertRaises(Http404):
+            refdata.get_or_404(Status, 999)
+
+
+class DashboardCountsTests(TicketFixtureMixin, TestCase):
+
+    def test_counts_cached_until_commit(self):
+        ticket = self.make_ticket(assigned=None)
+        self.assertEqual(dashboard.tab_counts(self.bob)["assigned_count"], 0)
+        with self.assertNumQueries(0):
+            dashboard.tab_counts(self.bob)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            services.assign_ticket(ticket.pk, self.bob)
+            # Still cached until the assignment commits.
+            self.assertEqual(dashboard.tab_counts(self.bob)["assigned_count"], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(dashboard.tab_counts(self.bob)["assigned_count"], 1)
+
+    @override_settings(DASHBOARD_CACHE_ALIAS="counts",
+                       CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                               "counts": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                          "LOCATION": "counts"}})
+    def test_cache_alias(self):
+        dashboard.tab_counts(self.alice)
+        self.assertIsNotNone(caches["counts"].get(dashboard.cache_key(self.alice.pk)))
+        self.assertIsNone(caches["default"].get(dashboard.cache_key(self.alice.pk)))
+
+
+class ExportTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+
+    def export(self, **params):
+        response = self.client.get(reverse("export_tickets"), params)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode()
+
+    def test_csv_follows_filters_and_sort(self):
+        self.make_ticket("Bravo")
+        self.make_ticket("Alpha")
+        self.make_ticket("Closed one", status=self.closed)
+        response, body = self.export(status=self.open.pk, sort="title", order="asc")
+        self.assertEqual(response.status_code, 200)
+        lines = body.splitlines()
+        self.assertTrue(lines[0].startswith("id,title,"))
+        self.assertEqual([line.split(",")[1] for line in lines[1:]], ["Alpha", "Bravo"])
+
+    def test_unknown_sort_or_format_rejected(self):
+        self.make_ticket()
+        for params in ({"sort": "nope"}, {"sort": "created_by__password"}, {"format": "xml"}):
+            with self.subTest(params=params):
+                response, _ = self.export(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.streaming)
+
+
+class BulkTests(TicketFixtureMixin, TestCase):
+
+    def test_status_change_writes_and_notifies_once(self):
+        tickets = [self.make_ticket(f"Ticket {n}") for n in range(2)]
+        done = self.make_ticket("Already closed", status=self.closed)
+        ids = [t.pk for t in tickets] + [done.pk]
+
+        changed = bulk.apply(self.bob, "status", ids, self.closed)
+
+        self.assertEqual(changed, [t.pk for t in tickets])
+        self.assertEqual(Ticket.objects.filter(pk__in=ids, status=self.closed).count(), 3)
+        # One batch for alice covering both changed tickets; bob acted, so
+        # nothing is queued for him.
+        rows = NotificationOutbox.objects.all()
+        self.assertEqual({row.recipient for row in rows}, {"alice@example.com"})
+        self.assertEqual(sorted(row.ticket_id for row in rows), changed)
+        self.assertEqual(len({row.batch for row in rows}), 1)
+        self.assertEqual(bulk.apply(self.bob, "status", ids, self.closed), [])
+
+    def test_assign_defaults_to_actor(self):
+        ticket = self.make_ticket(assigned=None)
+        self.assertEqual(bulk.apply(self.alice, "assign", [ticket.pk]), [ticket.pk])
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.assigned, self.alice)
+
+    def test_follow_and_unfollow_keep_counters(self):
+        followed = self.make_ticket("Followed", followers=[self.bob])
+        other = self.make_ticket("Other")
+        ids = [followed.pk, other.pk]
+
+        self.assertEqual(bulk.apply(self.bob, "follow", ids), [other.pk])
+        self.assertEqual(bulk.apply(self.bob, "follow", ids), [])
+        self.assertEqual(list(Ticket.objects.filter(pk__in=ids)
+                              .values_list("follower_count", flat=True)), [1, 1])
+        self.assertEqual(bulk.apply(self.bob, "unfollow", ids), ids)
+        self.assertEqual(list(Ticket.objects.filter(pk__in=ids)
+                              .values_list("follower_count", flat=True)), [0, 0])
+        self.assertFalse(Ticket.followers.through.objects.filter(user=self.bob).exists())
+
+    def test_follow_race_keeps_counter(self):
+        ticket = self.make_ticket()
+        bulk_create = QuerySet.bulk_create
+
+        raced = []
+
+        def concurrent_follow(queryset, *args, **kwargs):
+            # Another request follows the ticket after bulk read the follows.
+            if not raced:
+                raced.append(True)
+                ticket.followers.add(self.bob)
+            return bulk_create(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, "bulk_create", autospec=True,
+                               side_effect=concurrent_follow):
+            bulk.apply(self.bob, "follow", [ticket.pk])
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).follower_count, 1)
+
+    @override_settings(BULK_MAX_TICKETS=2)
+    def test_rejects_bad_requests(self):
+        ticket = self.make_ticket()
+        for action, ids, target in (("delete", [ticket.pk], None),
+                                    ("status", [ticket.pk], None),
+                                    ("follow", [], None),
+                                    ("follow", ["x"], None),
+                                    ("follow", [1, 2, 3], None)):
+            with self.subTest(action=action, ids=ids):
+                with self.assertRaises(bulk.BulkActionError):
+                    bulk.apply(self.bob, action, ids, target)
+
+    def test_views(self):
+        tickets = [self.make_ticket(f"Ticket {n}") for n in range(2)]
+        ids = [t.pk for t in tickets]
+        self.client.force_login(self.bob)
+
+        response = self.client.post(reverse("bulk_update_tickets"), {
+            "action": "transfer", "department": self.billing.pk, "tickets": ids})
+        self.assertRedirects(response, reverse("index"), fetch_redirect_response=False)
+        self.assertEqual(Ticket.objects.filter(department=self.billing).count(), 2)
+
+        response = self.client.post("/api/tickets/bulk/", {
+            "action": "status", "status": self.closed.pk, "tickets": ids},
+            content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_view_rejects_bad_assignee(self):
+        ticket = self.make_ticket(assigned=None)
+        self.client.force_login(self.bob)
+        for user, code in (("abc", 400), ("999999", 404)):
+            with self.subTest(user=user):
+                response = self.client.post(reverse("bulk_update_tickets"), {
+                    "action": "assign", "user": user, "tickets": [ticket.pk]})
+                self.assertEqual(response.status_code, code)
+        self.assertFalse(Ticket.objects.filter(assigned__isnull=False).exists())
+
+
+class ServicesTests(TicketFixtureMixin, TestCase):
+
+    def test_update_skips_rows_holding_the_value(self):
+        ticket = self.make_ticket()
+        stamp = Ticket.objects.get(pk=ticket.pk).updated
+        self.assertFalse(services.change_status(ticket.pk, self.open))
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).updated, stamp)
+
+        self.assertTrue(services.change_status(ticket.pk, self.closed))
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        self.assertEqual(ticket.status, self.closed)
+        self.assertGreater(ticket.updated, stamp)
+
+    def test_update_writes_only_its_column(self):
+        ticket = self.make_ticket()
+        # A concurrent edit to another column survives the transfer.
+        Ticket.objects.filter(pk=ticket.pk).update(title="Edited elsewhere")
+        services.transfer_ticket(ticket.pk, self.billing)
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        self.assertEqual((ticket.title, ticket.department), ("Edited elsewhere", self.billing))
+
+    def test_set_sentiment_leaves_updated_alone(self):
+        ticket = self.make_ticket()
+        stamp = Ticket.objects.get(pk=ticket.pk).updated
+        self.assertTrue(services.set_sentiment(ticket.pk, "Positive"))
+        self.assertFalse(services.set_sentiment(ticket.pk, "Positive"))
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        self.assertEqual((ticket.sentiment, ticket.updated), ("Positive", stamp))
+
+    def test_reassign_refreshes_previous_assignee(self):
+        ticket = self.make_ticket()
+        self.assertEqual(dashboard.tab_counts(self.bob)["assigned_count"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(services.assign_ticket(ticket.pk, self.alice))
+        self.assertEqual(dashboard.tab_counts(self.bob)["assigned_count"], 0)
+        self.assertFalse(services.assign_ticket(ticket.pk, self.alice))
+
+    def test_toggle_follow(self):
+        ticket = self.make_ticket()
+        self.assertTrue(services.toggle_follow(ticket, self.bob))
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).follower_count, 1)
+        self.assertFalse(services.toggle_follow(ticket, self.bob))
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).follower_count, 0)
+        self.assertFalse(ticket.followers.exists())
+
+
+class DashboardUserFilterTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+        User.objects.bulk_create([User(username=f"someone-{n}") for n in range(20)])
+        self.make_ticket("Alice's ticket")
+        self.make_ticket("Bob's ticket", created_by=self.bob)
+
+    def test_only_the_selected_user_is_rendered(self):
+        response = self.client.get(reverse("index"), {"created_by": self.alice.pk})
+        self.assertEqual([t.title for t in response.context["page_obj"]], ["Alice's ticket"])
+        self.assertContains(response, f'<option value="{self.alice.pk}" selected>alice</option>',
+                            html=True)
+        self.assertNotContains(response, "someone-")
+        self.assertContains(response, reverse("user_search"))
+
+    def test_unknown_user_is_ignored(self):
+        for value in ("999", "abc"):
+            response = self.client.get(reverse("index"), {"assigned": value})
+            self.assertEqual(response.status_code, 200)
+
+    def test_user_search(self):
+        response = self.client.get(reverse("user_search"), {"q": "someone-1"})
+        names = [row["username"] for row in response.json()["results"]]
+        self.assertEqual(names, sorted(names))
+        self.assertTrue(all(name.startswith("someone-1") for name in names))
+
+
+class TicketIndexTests(TicketFixtureMixin, TestCase):
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return " ".join(row[-1] for row in cursor.fetchall())
+
+    def test_filtered_listing_needs_no_sort(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite query plan")
+        for field, value in (("status", self.open), ("assigned", self.bob),
+                             ("department", self.support), ("created_by", self.alice)):
+            with self.subTest(field=field):
+                page = Ticket.objects.filter(**{field: value}).order_by("-updated", "-id")[:10]
+                plan = self.plan(page)
+                self.assertIn("USING INDEX", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+class SearchTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.printer = self.make_ticket("Printer is not working", posts=0)
+        TicketPost.objects.create(ticket=self.printer, user=self.alice,
+                                  message="The printer shows a paper jam")
+        self.vpn = self.make_ticket("VPN drops every hour", posts=0)
+        TicketPost.objects.create(ticket=self.vpn, user=self.alice,
+                                  message="Printing from home over VPN also fails")
+
+    def test_search_ranks_tickets(self):
+        results = search.search("printer jam")
+        self.assertEqual([pk for pk, _ in results], [self.printer.pk])
+        self.assertEqual([pk for pk, _ in search.search("vpn")], [self.vpn.pk])
+        # The last word matches as a prefix.
+        self.assertEqual({pk for pk, _ in search.search("print")}, {self.printer.pk, self.vpn.pk})
+        self.assertEqual(search.search("   "), [])
+        self.assertEqual(search.search('"OR* NEAR('), [])
+
+    def test_index_follows_writes(self):
+        post = TicketPost.objects.create(ticket=self.vpn, user=self.bob, message="Keyboard replaced")
+        self.assertEqual([pk for pk, _ in search.search("keyboard")], [self.vpn.pk])
+        post.delete()
+        self.assertEqual(search.search("keyboard"), [])
+
+    def test_dashboard_and_api_search(self):
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse("index"), {"q": "jam"})
+        self.assertEqual([t.pk for t in response.context["page_obj"]], [self.printer.pk])
+
+        response = self.client.get("/api/tickets/search/", {"q": "vpn"})
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.vpn.pk])
+
+    def test_migration_backfills_existing_rows(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Backfill SQL is checked against SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {search.TABLE}")
+        self.assertEqual(search.search("printer"), [])
+
+        migration = importlib.import_module("ticket.migrations.0012_backfill_ticket_search")
+        # Only quote_name() and the connection are used; no DDL is run.
+        migration.backfill_search_table(apps, connection.schema_editor())
+        self.assertEqual({pk for pk, _ in search.search("printer")}, {self.printer.pk})
+        self.assertEqual({pk for pk, _ in search.search("home")}, {self.vpn.pk})
+
+
+class InstrumentationTests(TicketFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_user("admin", "admin@example.com", "pw", is_staff=True)
+
+    def test_metrics_are_limited_to_allowed_ips_and_staff(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)  # loopback
+        remote = {"REMOTE_ADDR": "203.0.113.7"}
+        self.assertEqual(self.client.get("/metrics", **remote).status_code, 403)
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get("/metrics", **remote).status_code, 403)
+        self.client.force_login(self.admin)
+        response = self.client.get("/metrics", **remote)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ticket_instrumentation_sample_rate", response.content.decode())
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_server_timing_only_for_staff(self):
+        self.client.force_login(self.bob)
+        self.assertNotIn("Server-Timing", self.client.get(reverse("index")))
+        self.client.force_login(self.admin)
+        self.assertIn("db;dur=", self.client.get(reverse("index"))["Server-Timing"])
@@ -8,8 +8,12 @@ urlpatterns = [
     path("logout/", views.logoutuser, name="logout"),
     path("register/", views.register, name="register"),
     path("my-tickets/", views.my_tickets, name="my_tickets"),
+    path("bulk/", views.bulk_update_tickets, name="bulk_update_tickets"),
+    path("export/", views.export_tickets, name="export_tickets"),
+    path("users/search/", views.user_search, name="user_search"),
     path("create-ticket/", views.create_ticket, name="create_ticket"),
     path("view-ticket/<str:pk>/", views.view_ticket, name="view_ticket"),
+    path("view-ticket/<str:pk>/posts/", views.ticket_posts, name="ticket_posts"),
     path("transfer-ticket/<str:pk>/",
          views.transfer_ticket, name="transfer_ticket"),
     path("assign-ticket/<str:pk>/", views.assign_ticket, name="assign_ticket"),
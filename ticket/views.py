@@ -1,10 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from .forms import UserCreationForm
 from django.contrib.auth import authenticate, login, logout
 from .models import Ticket, TicketType, Department, Status, TicketPost
 from django.contrib import messages
+from django.middleware.csrf import get_token
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.conf import settings
+from django.urls import reverse
+from .pagination import CursorPaginator, keyset_filter
+from . import bulk, conditional, dashboard, export, refdata, services
 from .filters import TicketFilter
 from .forms import TicketForm, TicketPostForm, TicketPostingForm, MyUserCreationForm
 from django.contrib.auth.models import User
@@ -12,6 +18,43 @@ from django.contrib.auth.decorators import login_required
 from .utils import send_ticket_update_notification
 
 
+TICKETS_PER_PAGE = 10
+
+
+def paginate_tickets(request, tickets):
+    """
+    Page a ticket listing. The default ``updated`` sort uses keyset
+    pagination so deep pages cost the same as the first one; other sort
+    columns and ranked search results keep numbered pages.
+    """
+    searching = bool(request.GET.get("q"))
+    if request.GET.get("sort", "updated") == "updated" and not searching:
+        paginator = CursorPaginator(
+            tickets,
+            TICKETS_PER_PAGE,
+            descending=request.GET.get("order", "desc") == "desc",
+            count_cap=getattr(settings, "TICKET_LIST_COUNT_CAP", 1000),
+        )
+        return paginator.page(request.GET.get("cursor"))
+
+    paginator = Paginator(tickets, TICKETS_PER_PAGE)
+    page_number = request.GET.get("page", 1)
+    try:
+        return paginator.page(page_number)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+
+def page_query(request):
+    """Current query string without the paging parameters."""
+    query = request.GET.copy()
+    query.pop("page", None)
+    query.pop("cursor", None)
+    return query.urlencode()
+
+
 @login_required
 def index(request):
     sort_by = request.GET.get("sort", "updated")
@@ -19,22 +62,17 @@ def index(request):
     if order == "desc":
         sort_by = f"-{sort_by}"
 
-    tickets = Ticket.objects.all().order_by(sort_by)
+    tickets = Ticket.objects.for_list().order_by(sort_by)
 
     ticket_filter = TicketFilter(request.GET, queryset=tickets)
     filtered_tickets = ticket_filter.qs
+    if request.GET.get("q") and "sort" in request.GET:
+        # Search results default to rank order unless a column was chosen.
+        filtered_tickets = filtered_tickets.order_by(sort_by)
 
-    paginator = Paginator(filtered_tickets, 10)
-    page_number = request.GET.get("page", 1)
-    try:
-        page_obj = paginator.page(page_number)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    page_obj = paginate_tickets(request, filtered_tickets)
 
-    departments = Department.objects.all()
-    users = User.objects.filter(is_active=True)
+    departments = refdata.departments()
 
     context = {
         "page_obj": page_obj,
@@ -42,12 +80,97 @@ def index(request):
         "sort_by": request.GET.get("sort", "updated"),
         "order": request.GET.get("order", "desc"),
         "departments": departments,
-        "users": users,
+        "statuses": refdata.statuses(),
+        "page_query": page_query(request),
     }
 
     return render(request, "ticket/index.html", context)
 
 
+@login_required
+def bulk_update_tickets(request):
+    """Apply one triage action to the tickets selected on the dashboard."""
+    query = request.POST.get("query", "")
+    if request.method == "POST":
+        action = request.POST.get("action")
+        target = None
+        if action == "assign" and request.POST.get("user"):
+            user_id = request.POST.get("user")
+            if not user_id.isdigit():
+                return HttpResponse(f"Invalid user id: {user_id}", status=400)
+            target = get_object_or_404(User, pk=user_id)
+        elif action == "transfer":
+            target = refdata.get_or_404(Department, request.POST.get("department"))
+        elif action == "status":
+            target = refdata.get_or_404(Status, request.POST.get("status"))
+
+        try:
+            changed = bulk.apply(request.user, action, request.POST.getlist("tickets"), target)
+        except bulk.BulkActionError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f"Updated {len(changed)} ticket(s).")
+
+    return redirect(f"{reverse('index')}?{query}" if query else "index")
+
+
+# Columns the dashboard can sort on. The export checks ``sort`` against them
+# up front: a bad field would only fail once the streaming response started.
+SORT_FIELDS = ("id", "title", "priority", "department__department",
+               "status__status", "assigned__username", "updated")
+
+
+@login_required
+def export_tickets(request):
+    """
+    Stream every ticket matching the dashboard filters as CSV (default) or
+    NDJSON (``?format=ndjson``). Accepts the same parameters as ``index``.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return HttpResponse(f"Unsupported export format: {fmt}", status=400)
+
+    sort_by = request.GET.get("sort", "updated")
+    if sort_by not in SORT_FIELDS:
+        return HttpResponse(f"Unsupported sort column: {sort_by}", status=400)
+    if request.GET.get("order", "desc") == "desc":
+        sort_by = f"-{sort_by}"
+    tickets = TicketFilter(request.GET, queryset=Ticket.objects.order_by(sort_by, "-id")).qs
+    if request.GET.get("q") and "sort" in request.GET:
+        tickets = tickets.order_by(sort_by, "-id")
+
+    response = StreamingHttpResponse(
+        export.stream(tickets, fmt), content_type=export.FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="tickets.{fmt}"'
+    return response
+
+
+USER_SEARCH_PAGE_SIZE = 20
+
+
+@login_required
+def user_search(request):
+    """
+    Typeahead lookup of active users by username prefix. Results are keyset
+    paginated on username via ``?after=`` so every page is an index range scan.
+    """
+    users = User.objects.filter(is_active=True).order_by("username")
+    prefix = request.GET.get("q", "").strip()
+    if prefix:
+        users = users.filter(username__startswith=prefix)
+    after = request.GET.get("after")
+    if after:
+        users = users.filter(username__gt=after)
+
+    rows = list(users.values("id", "username")[:USER_SEARCH_PAGE_SIZE + 1])
+    has_more = len(rows) > USER_SEARCH_PAGE_SIZE
+    rows = rows[:USER_SEARCH_PAGE_SIZE]
+    return JsonResponse({
+        "results": rows,
+        "next": rows[-1]["username"] if has_more else None,
+    })
+
+
 @login_required
 def create_ticket(request):
     if request.method == "POST":
@@ -59,7 +182,7 @@ def create_ticket(request):
             ticket = ticket_form.save(commit=False)
             ticket.created_by = request.user
 
-            open_status = Status.objects.get(status="Open")
+            open_status = refdata.get_status("Open")
             ticket.status = open_status
 
             ticket.save()
@@ -82,13 +205,89 @@ def create_ticket(request):
     )
 
 
+THREAD_PAGE_SIZE = 20
+
+
+def thread_page(ticket_id, before=None, after=None):
+    """
+    Up to THREAD_PAGE_SIZE posts, oldest first, and whether more remain in
+    that direction: the newest posts by default, the ones preceding post
+    ``before``, or the ones following post ``after``. Paging is keyset on
+    (created, id), so any page of a long thread costs the same.
+    """
+    posts = TicketPost.objects.filter(ticket_id=ticket_id).select_related("user")
+    anchor_id = after if after is not None else before
+    if anchor_id is not None:
+        anchor = TicketPost.objects.filter(
+            ticket_id=ticket_id, pk=anchor_id).values_list("created", flat=True).first()
+        if anchor is None:
+            raise Http404("No such post in this ticket.")
+        posts = posts.filter(keyset_filter(
+            ("created", "id"), (anchor, anchor_id), descending=after is None))
+
+    if after is not None:
+        page = list(posts.order_by("created", "id")[:THREAD_PAGE_SIZE + 1])
+        return page[:THREAD_PAGE_SIZE], len(page) > THREAD_PAGE_SIZE
+    page = list(posts.order_by("-created", "-id")[:THREAD_PAGE_SIZE + 1])
+    return page[:THREAD_PAGE_SIZE][::-1], len(page) > THREAD_PAGE_SIZE
+
+
+@login_required
+def ticket_posts(request, pk):
+    """
+    A slice of a ticket's thread as an HTML fragment: ``?before=<post id>``
+    for "show older", ``?after=<post id>`` for posts announced over the
+    real-time channel. The response carries the id to continue from.
+    """
+    if not str(pk).isdigit():
+        raise Http404("No Ticket matches the given query.")
+    direction = "after" if "after" in request.GET else "before"
+    try:
+        anchor = int(request.GET[direction])
+    except (KeyError, ValueError):
+        return JsonResponse(
+            {"error": "A numeric 'before' or 'after' post id is required."}, status=400)
+
+    posts, has_more = thread_page(pk, **{direction: anchor})
+    cursor = None
+    if has_more:
+        cursor = posts[-1].id if direction == "after" else posts[0].id
+    return JsonResponse({
+        "html": render_to_string("ticket/post_list.html", {"posts": posts}, request),
+        direction: cursor,
+    })
+
+
 @login_required
 def view_ticket(request, pk):
-    ticket = get_object_or_404(Ticket, id=pk)
-    posts = ticket.posts.all().order_by("created")
-    departments = Department.objects.all()
-    statuses = Status.objects.all()
-    is_following = request.user in ticket.followers.all()
+    # Polling a page that has not changed is answered from the probe and the
+    # follow-state lookup. The page is per user (follow state, CSRF token)
+    # and pages carrying a one-off flash message are never revalidated.
+    etag = is_following = None
+    if request.method == "GET" and not messages.get_messages(request):
+        row = conditional.probe_ticket(pk)
+        if row is not None:
+            is_following = Ticket.followers.through.objects.filter(
+                ticket_id=pk, user_id=request.user.pk).exists()
+            # get_token() sets the CSRF secret on a first visit too, so the
+            # ETag matches the token the rendered page carries.
+            get_token(request)
+            etag = conditional.etag([row], request.user.pk, is_following,
+                                    request.META.get("CSRF_COOKIE"))
+            response = conditional.not_modified(request, etag)
+            if response is not None:
+                return response
+
+    ticket = get_object_or_404(
+        Ticket.objects.select_related(
+            "type", "department", "status", "created_by", "assigned"),
+        id=pk,
+    )
+    posts, has_older_posts = thread_page(ticket.id)
+    departments = refdata.departments()
+    statuses = refdata.statuses()
+    if is_following is None:
+        is_following = ticket.followers.filter(pk=request.user.pk).exists()
 
     if request.method == "POST":
         form = TicketPostingForm(request.POST, request.FILES)
@@ -99,8 +298,8 @@ def view_ticket(request, pk):
             post.save()
 
             # Send email notifications
-            # send_ticket_update_notification(
-            #     ticket, post, exclude_user=request.user)
+            send_ticket_update_notification(
+                ticket, post, exclude_user=request.user)
 
             return redirect("view_ticket", pk=ticket.id)
     else:
@@ -109,12 +308,16 @@ def view_ticket(request, pk):
     context = {
         "ticket": ticket,
         "posts": posts,
+        "has_older_posts": has_older_posts,
         "form": form,
         "departments": departments,
         "statuses": statuses,
         "is_following": is_following
     }
-    return render(request, "ticket/view_ticket.html", context)
+    response = render(request, "ticket/view_ticket.html", context)
+    if etag is not None:
+        conditional.set_etag(response, etag)
+    return response
 
 
 def loginuser(request):
@@ -161,21 +364,19 @@ def register(request):
 
 @login_required
 def assign_ticket(request, pk):
-    ticket = get_object_or_404(Ticket, id=pk)
-    ticket.assigned = request.user
-    ticket.save()
+    ticket = get_object_or_404(Ticket.objects.only("id"), id=pk)
+    services.assign_ticket(ticket.id, request.user)
     return redirect("view_ticket", pk=ticket.id)
 
 
 @login_required
 def transfer_ticket(request, pk):
-    ticket = get_object_or_404(Ticket, id=pk)
+    ticket = get_object_or_404(Ticket.objects.only("id"), id=pk)
 
     if request.method == "POST":
         department_id = request.POST.get("department")
-        new_department = get_object_or_404(Department, id=department_id)
-        ticket.department = new_department
-        ticket.save()
+        new_department = refdata.get_or_404(Department, department_id)
+        services.transfer_ticket(ticket.id, new_department)
         messages.success(
             request, f"Ticket transferred to {new_department.department} successfully.")
         return redirect("view_ticket", pk=ticket.id)
@@ -185,13 +386,12 @@ def transfer_ticket(request, pk):
 
 @login_required
 def change_status(request, pk):
-    ticket = get_object_or_404(Ticket, id=pk)
+    ticket = get_object_or_404(Ticket.objects.only("id"), id=pk)
 
     if request.method == "POST":
         status_id = request.POST.get("status")
-        new_status = get_object_or_404(Status, id=status_id)
-        ticket.status = new_status
-        ticket.save()
+        new_status = refdata.get_or_404(Status, status_id)
+        services.change_status(ticket.id, new_status)
         messages.success(
             request, f"Ticket status changed to {new_status.status} successfully.")
         return redirect("view_ticket", pk=ticket.id)
@@ -201,13 +401,12 @@ def change_status(request, pk):
 
 @login_required
 def quick_transfer_ticket(request, pk):
-    ticket = get_object_or_404(Ticket, pk=pk)
+    ticket = get_object_or_404(Ticket.objects.only("id"), pk=pk)
     if request.method == 'POST':
         department_id = request.POST.get('department')
         if department_id:
-            department = get_object_or_404(Department, pk=department_id)
-            ticket.department = department
-            ticket.save()
+            department = refdata.get_or_404(Department, department_id)
+            services.transfer_ticket(ticket.id, department)
             messages.success(
                 request, f'Ticket #{ticket.id} transferred to {department.department}')
     return redirect('index')
@@ -215,14 +414,13 @@ def quick_transfer_ticket(request, pk):
 
 @login_required
 def quick_assign_ticket(request, pk, user_id=None):
-    ticket = get_object_or_404(Ticket, pk=pk)
+    ticket = get_object_or_404(Ticket.objects.only("id"), pk=pk)
     if request.method == 'POST':
         if user_id:
             user = get_object_or_404(User, pk=user_id)
         else:
             user = request.user
-        ticket.assigned = user
-        ticket.save()
+        services.assign_ticket(ticket.id, user)
         messages.success(
             request, f'Ticket #{ticket.id} assigned to {user.username}')
     return redirect('index')
@@ -279,13 +477,11 @@ def updatePost(request, pk):
 
 @login_required
 def follow_ticket(request, pk):
-    ticket = get_object_or_404(Ticket, id=pk)
-    if request.user in ticket.followers.all():
-        ticket.followers.remove(request.user)
-        messages.success(request, "You have unfollowed this ticket.")
-    else:
-        ticket.followers.add(request.user)
+    ticket = get_object_or_404(Ticket.objects.only("id"), id=pk)
+    if services.toggle_follow(ticket, request.user):
         messages.success(request, "You are now following this ticket.")
+    else:
+        messages.success(request, "You have unfollowed this ticket.")
     return redirect("view_ticket", pk=ticket.id)
 
 
@@ -299,34 +495,25 @@ def my_tickets(request):
     if order == "desc":
         sort_by = f"-{sort_by}"
 
-    if filter_type == 'created':
-        tickets = Ticket.objects.filter(created_by=request.user)
-    elif filter_type == 'assigned':
-        tickets = Ticket.objects.filter(assigned=request.user)
+    tickets = Ticket.objects.for_list()
+    if filter_type == 'assigned':
+        tickets = tickets.filter(assigned=request.user)
     elif filter_type == 'followed':
-        tickets = request.user.followed_tickets.all()
+        tickets = tickets.filter(followers=request.user)
     else:
-        tickets = Ticket.objects.filter(created_by=request.user)
+        tickets = tickets.filter(created_by=request.user)
 
     tickets = tickets.order_by(sort_by)
 
-    paginator = Paginator(tickets, 10)
-    page_number = request.GET.get("page", 1)
-    try:
-        page_obj = paginator.page(page_number)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    page_obj = paginate_tickets(request, tickets)
 
     context = {
         "page_obj": page_obj,
         "sort_by": request.GET.get("sort", "updated"),
         "order": request.GET.get("order", "desc"),
         "filter_type": filter_type,
-        "created_count": Ticket.objects.filter(created_by=request.user).count(),
-        "assigned_count": Ticket.objects.filter(assigned=request.user).count(),
-        "followed_count": request.user.followed_tickets.count(),
+        "page_query": page_query(request),
+        **dashboard.tab_counts(request.user),
     }
 
     return render(request, "ticket/my_tickets.html", context)
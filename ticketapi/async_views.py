@@ -0,0 +1,186 @@
+"""
+Async variants of the hot ticket API endpoints, served under /api/async/.
+
+DRF views are synchronous, so under ASGI each request to TicketViewSet holds
+a worker thread from start to finish. These are plain async Django views
+that reuse the API's serializers, pagination and conditional GET handling
+and return the same JSON. Reads go through the async ORM, so one server
+process can keep many requests in flight while they wait on the database.
+Writes still run the transactional ``ticket.services`` code through
+``sync_to_async``; Django has no async transactions.
+
+Authentication matches the DRF API: a JWT bearer token, or a session
+cookie plus the CSRF token on unsafe methods.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions, status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import ForcedAuthentication, Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from ticket import conditional, refdata, services
+from ticket.models import Status, Ticket
+from ticket.utils import send_ticket_update_notification
+from .pagination import TicketCursorPagination
+from .serializers import TicketListSerializer, TicketPostSerializer, TicketSerializer
+
+# Same scope as the sync views' ``request.accepted_renderer.format``, so
+# ETags stay valid when a client moves between the two.
+FORMAT = "json"
+
+PARSERS = (JSONParser(), FormParser(), MultiPartParser())
+
+_jwt = JWTAuthentication()
+_session = SessionAuthentication()
+
+
+def _json(data, status=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status,
+                        content_type="application/json")
+
+
+async def _authenticate(request):
+    """``(user, token)`` for the request; token is None for session auth."""
+    result = await sync_to_async(_jwt.authenticate)(request)
+    if result is not None:
+        return result
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    # The session is loaded by auser(), so the CSRF check does no I/O.
+    _session.enforce_csrf(request)
+    return user, None
+
+
+def api_view(view):
+    """
+    Authenticate like the DRF API and render API errors and 404s as JSON.
+    ``view`` receives a DRF ``Request`` for parsed data and query params.
+    """
+    @csrf_exempt
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user, auth = await _authenticate(request)
+            request.user = user
+            # Hand the result to the DRF Request; with no authenticators
+            # its ``user`` would resolve to AnonymousUser.
+            drf_request = Request(request, parsers=PARSERS,
+                                  authenticators=[ForcedAuthentication(user, auth)])
+            return await view(drf_request, *args, **kwargs)
+        except Http404 as e:
+            return _json({"detail": str(e) or "Not found."}, status.HTTP_404_NOT_FOUND)
+        except exceptions.APIException as e:
+            response = _json({"detail": e.detail}, e.status_code)
+            if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response["WWW-Authenticate"] = _jwt.authenticate_header(request)
+            return response
+    return wrapper
+
+
+async def _ticket_exists(pk):
+    if not await Ticket.objects.filter(pk=pk).aexists():
+        raise Http404("No Ticket matches the given query.")
+
+
+@require_GET
+@api_view
+async def ticket_list(request):
+    """Async ``GET /api/tickets/``."""
+    paginator = TicketCursorPagination()
+    queryset = Ticket.objects.for_list()
+
+    etag = None
+    if not request.query_params.get("total"):
+        # The approximate total is not covered by the page probe.
+        rows = await paginator.aprobe(
+            conditional.with_probe(queryset), request, conditional.PROBE_FIELDS)
+        etag = conditional.etag(rows, FORMAT)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+
+    page = await paginator.apaginate_queryset(queryset, request)
+    data = TicketListSerializer(page, many=True, context={"request": request}).data
+    response = _json(paginator.get_paginated_response(data).data)
+    if etag is not None:
+        conditional.set_etag(response, etag)
+    return response
+
+
+@require_GET
+@api_view
+async def ticket_detail(request, pk):
+    """Async ``GET /api/tickets/<pk>/``."""
+    row = await conditional.aprobe_ticket(pk)
+    if row is None:
+        raise Http404("No Ticket matches the given query.")
+
+    etag = conditional.etag([row], FORMAT)
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return response
+
+    try:
+        ticket = await Ticket.objects.select_related(
+            "created_by", "assigned", "status", "department", "type"
+        ).prefetch_related("posts__user", "followers").aget(pk=pk)
+    except Ticket.DoesNotExist:
+        raise Http404("No Ticket matches the given query.")
+
+    serializer = TicketSerializer(ticket, context={
+        "request": request,
+        "default_expand": TicketSerializer.expandable_fields,
+    })
+    return conditional.set_etag(_json(serializer.data), etag)
+
+
+@require_POST
+@api_view
+async def add_post(request, pk):
+    """Async ``POST /api/tickets/<pk>/add_post/``."""
+    try:
+        ticket = await Ticket.objects.aget(pk=pk)
+    except Ticket.DoesNotExist:
+        raise Http404("No Ticket matches the given query.")
+
+    serializer = TicketPostSerializer(data=request.data, context={"request": request})
+    if not serializer.is_valid():
+        return _json(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    post = await sync_to_async(serializer.save)(ticket=ticket, user=request.user)
+    await sync_to_async(send_ticket_update_notification)(
+        ticket, post, exclude_user=request.user)
+    return _json(TicketPostSerializer(post, context={"request": request}).data,
+                 status.HTTP_201_CREATED)
+
+
+@require_POST
+@api_view
+async def assign_to_me(request, pk):
+    """Async ``POST /api/tickets/<pk>/assign_to_me/``."""
+    await _ticket_exists(pk)
+    await sync_to_async(services.assign_ticket)(pk, request.user)
+    return _json({"status": "Ticket assigned successfully"})
+
+
+@require_POST
+@api_view
+async def change_status(request, pk):
+    """Async ``POST /api/tickets/<pk>/change_status/``."""
+    await _ticket_exists(pk)
+    status_id = request.data.get("status")
+    if not status_id:
+        return _json({"error": "Status ID is required"}, status.HTTP_400_BAD_REQUEST)
+
+    new_status = await sync_to_async(refdata.get_or_404)(Status, status_id)
+    await sync_to_async(services.change_status)(pk, new_status)
+    return _json({"status": f"Ticket status changed to {new_status.status}"})
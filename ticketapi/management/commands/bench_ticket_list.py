@@ -0,0 +1,69 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from ticket.models import Ticket, TicketPost
+from ticketapi.serializers import TicketListSerializer, TicketSerializer
+
+
+class Command(BaseCommand):
+    help = ("Compare payload size and serialization time of the nested ticket "
+            "serializer against the list serializer. Seed data is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickets", type=int, default=10000)
+        parser.add_argument("--posts", type=int, default=3,
+                            help="Posts per seeded ticket")
+        parser.add_argument("--followers", type=int, default=2,
+                            help="Followers per seeded ticket")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options["tickets"], options["posts"], options["followers"])
+            nested = self.measure(
+                TicketSerializer, Ticket.objects.all())
+            flat = self.measure(TicketListSerializer, Ticket.objects.for_list())
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'serializer':<22}{'bytes':>14}{'seconds':>10}{'queries':>10}")
+        for name, (size, elapsed, queries) in (("TicketSerializer", nested),
+                                               ("TicketListSerializer", flat)):
+            self.stdout.write(f"{name:<22}{size:>14}{elapsed:>10.2f}{queries:>10}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Payload reduced {nested[0] / max(flat[0], 1):.1f}x, "
+            f"time reduced {nested[1] / max(flat[1], 1e-9):.1f}x"))
+
+    def seed(self, tickets, posts, followers):
+        users = User.objects.bulk_create(
+            [User(username=f"bench-list-{i}") for i in range(max(followers, 1) + 1)])
+        created = Ticket.objects.bulk_create(
+            [Ticket(title=f"Benchmark ticket {i}", created_by=users[0])
+             for i in range(tickets)],
+            batch_size=1000,
+        )
+        TicketPost.objects.bulk_create(
+            [TicketPost(ticket=ticket, user=users[0],
+                        message=f"Benchmark post {n} for ticket {ticket.pk}")
+             for ticket in created for n in range(posts)],
+            batch_size=1000,
+        )
+        Through = Ticket.followers.through
+        Through.objects.bulk_create(
+            [Through(ticket_id=ticket.pk, user_id=user.pk)
+             for ticket in created for user in users[1:followers + 1]],
+            batch_size=1000,
+        )
+        # bulk_create skips the signals that maintain the counters.
+        Ticket.objects.filter(created_by=users[0]).recount()
+
+    def measure(self, serializer_class, queryset):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            data = serializer_class(queryset, many=True).data
+            payload = JSONRenderer().render(data)
+            elapsed = time.perf_counter() - start
+        return len(payload), elapsed, len(queries)
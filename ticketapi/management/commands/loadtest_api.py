@@ -0,0 +1,198 @@
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ticket import refdata
+from ticket.models import Status, Ticket
+
+
+class Command(BaseCommand):
+    help = ("Closed-loop HTTP load test of the ticket API against running servers, "
+            "e.g. the sync DRF views under WSGI and the async views under ASGI. "
+            "Each target is driven at increasing concurrency; the ceiling is the "
+            "highest level that keeps p95 latency within --slo-ms and errors "
+            "under 1%. Run it from a separate host or process so the client is "
+            "not the bottleneck.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target", action="append", required=True, metavar="NAME=URL",
+            help="API root to test, repeatable: wsgi=http://localhost:8001/api/ "
+                 "or asgi=http://localhost:8000/api/async/")
+        parser.add_argument("--concurrency", type=int, nargs="+",
+                            default=[1, 8, 32, 64, 128, 256])
+        parser.add_argument("--duration", type=float, default=15.0,
+                            help="Seconds per concurrency level")
+        parser.add_argument("--slo-ms", type=float, default=250.0,
+                            help="p95 latency budget for the ceiling")
+        parser.add_argument("--writes", action="store_true",
+                            help="Mix in add_post, assign_to_me and change_status "
+                                 "(modifies the database the servers use)")
+        parser.add_argument("--username",
+                            help="Authenticate as this user (default: the busiest assignee)")
+        parser.add_argument("--tickets", type=int, default=200,
+                            help="Number of recent tickets to spread requests over")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        targets = []
+        for value in options["target"]:
+            name, sep, url = value.partition("=")
+            if not sep or not url.startswith(("http://", "https://")):
+                raise CommandError(f"--target must look like name=http://host/api/, got {value!r}")
+            targets.append((name, url.rstrip("/") + "/"))
+
+        ticket_ids = list(Ticket.objects.order_by("-updated", "-id")
+                          .values_list("pk", flat=True)[:options["tickets"]])
+        if not ticket_ids:
+            raise CommandError("No tickets found; run `manage.py seed_load` first.")
+        status_ids = [status.pk for status in refdata.rows(Status)]
+
+        user = self.pick_user(options["username"])
+        token = str(RefreshToken.for_user(user).access_token)
+        self.stdout.write(f"Authenticated as {user.username}; "
+                          f"{len(ticket_ids)} tickets, {options['duration']:g}s per level")
+
+        ceilings = {}
+        self.stdout.write(f"{'target':<10}{'conc':>6}{'req/s':>10}{'p50 ms':>10}"
+                          f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+        for name, url in targets:
+            ceilings[name] = None
+            for concurrency in options["concurrency"]:
+                result = self.run_level(url, token, concurrency, ticket_ids,
+                                        status_ids, options)
+                ok = (result["p95_ms"] <= options["slo_ms"]
+                      and result["error_rate"] < 0.01)
+                if ok:
+                    ceilings[name] = concurrency
+                line = (f"{name:<10}{concurrency:>6}{result['rps']:>10.1f}"
+                        f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+                        f"{result['p99_ms']:>10.1f}{result['error_rate']:>8.1%}")
+                self.stdout.write(line if ok else self.style.WARNING(line))
+
+        self.stdout.write(f"\nConcurrency ceiling (p95 <= {options['slo_ms']:g}ms, "
+                          f"errors < 1%):")
+        for name, ceiling in ceilings.items():
+            self.stdout.write(f"{name:<10}{ceiling if ceiling is not None else 'none':>6}")
+
+    def pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username!r} does not exist.")
+        user_id = (Ticket.objects.exclude(assigned__isnull=True)
+                   .values_list("assigned", flat=True).first())
+        if user_id is None:
+            user_id = Ticket.objects.values_list("created_by", flat=True).first()
+        return User.objects.get(pk=user_id)
+
+    def scenarios(self, writes):
+        """(weight, method, path template, body) tuples; mostly reads, like the real traffic."""
+        mix = [
+            (6, "GET", "tickets/", None),
+            (6, "GET", "tickets/{ticket}/", None),
+        ]
+        if writes:
+            mix += [
+                (2, "POST", "tickets/{ticket}/add_post/", {"message": "Load test reply"}),
+                (1, "POST", "tickets/{ticket}/assign_to_me/", {}),
+                (1, "POST", "tickets/{ticket}/change_status/", {"status": "{status}"}),
+            ]
+        return mix
+
+    def run_level(self, url, token, concurrency, ticket_ids, status_ids, options):
+        mix = self.scenarios(options["writes"])
+        weights = [weight for weight, *_ in mix]
+        deadline = time.perf_counter() + options["duration"]
+        lock = threading.Lock()
+        latencies, errors = [], [0]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            client = Client(url, token, options["timeout"])
+            local, failed = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    _, method, path, body = rng.choices(mix, weights)[0]
+                    ticket = rng.choice(ticket_ids)
+                    if body:
+                        body = {key: str(value).format(status=rng.choice(status_ids))
+                                for key, value in body.items()}
+                    start = time.perf_counter()
+                    if client.request(method, path.format(ticket=ticket), body):
+                        local.append((time.perf_counter() - start) * 1000)
+                    else:
+                        failed += 1
+            finally:
+                client.close()
+            with lock:
+                latencies.extend(local)
+                errors[0] += failed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i in range(concurrency):
+                pool.submit(worker, options["seed"] * 100003 + i)
+        elapsed = time.perf_counter() - started
+
+        total = len(latencies) + errors[0]
+        return {
+            "rps": len(latencies) / elapsed,
+            "p50_ms": self.percentile(latencies, 50),
+            "p95_ms": self.percentile(latencies, 95),
+            "p99_ms": self.percentile(latencies, 99),
+            "error_rate": errors[0] / total if total else 1.0,
+        }
+
+    def percentile(self, values, pct):
+        if len(values) < 2:
+            return values[0] if values else float("inf")
+        return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+class Client:
+    """One keep-alive connection per worker, reopened after failures."""
+
+    def __init__(self, url, token, timeout):
+        parts = urlsplit(url)
+        self.connection_class = HTTPSConnection if parts.scheme == "https" else HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        """Send one request; True for a 2xx/3xx response."""
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = urlencode(body)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            if self.connection is None:
+                self.connection = self.connection_class(self.netloc, timeout=self.timeout)
+            self.connection.request(method, self.prefix + path, payload, headers)
+            response = self.connection.getresponse()
+            response.read()
+            if response.will_close:
+                self.close()
+            return response.status < 400
+        except (OSError, HTTPException):
+            self.close()
+            return False
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
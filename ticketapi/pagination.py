@@ -0,0 +1,137 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from ticket.pagination import CursorPaginator, PostCursorPaginator
+
+
+class TicketCursorPagination(BasePagination):
+    """
+    Keyset pagination on ``(updated, id)`` for ticket listings.
+
+    Pass ``?total=1`` to include an approximate total, counted up to
+    ``count_cap`` rows so the cost stays bounded on large result sets.
+    """
+
+    page_size = 25
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_cap = 1000
+    paginator_class = CursorPaginator
+    descending = True
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _paginator(self, queryset, request, count_cap=None):
+        return self.paginator_class(
+            queryset, self.get_page_size(request),
+            descending=self.descending, count_cap=count_cap)
+
+    def _count_cap(self, request):
+        return self.count_cap if request.query_params.get("total") else None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = self._paginator(queryset, request, self._count_cap(request))
+        self.page = paginator.page(
+            request.query_params.get(self.cursor_query_param))
+        return list(self.page)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset()`` for async views."""
+        self.request = request
+        paginator = self._paginator(queryset, request, self._count_cap(request))
+        self.page = await paginator.apage(
+            request.query_params.get(self.cursor_query_param))
+        return list(self.page)
+
+    def probe(self, queryset, request, fields):
+        """
+        The rows the page for ``request`` would hold, as dicts of ``fields``:
+        the same keyset query, without joins or model instances.
+        """
+        paginator = self._paginator(queryset.values(*fields), request)
+        return list(paginator.page(request.query_params.get(self.cursor_query_param)))
+
+    async def aprobe(self, queryset, request, fields):
+        paginator = self._paginator(queryset.values(*fields), request)
+        return list(await paginator.apage(
+            request.query_params.get(self.cursor_query_param)))
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        payload = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+        }
+        if self.page.approximate_total is not None:
+            payload["approximate_total"] = self.page.approximate_total
+            payload["total_capped"] = self.page.total_capped
+        payload["results"] = data
+        return Response(payload)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": "total",
+                "required": False,
+                "in": "query",
+                "description": "Include an approximate total when set.",
+                "schema": {"type": "boolean"},
+            },
+        ]
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "approximate_total": {"type": "integer"},
+                "total_capped": {"type": "boolean"},
+                "results": schema,
+            },
+        }
+
+
+class PostCursorPagination(TicketCursorPagination):
+    """Keyset pagination over a ticket thread, oldest post first."""
+
+    page_size = 50
+    max_page_size = 200
+    paginator_class = PostCursorPaginator
+    descending = False
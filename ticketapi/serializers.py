@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from ticket.models import Ticket, TicketPost, Status, Department, TicketType
+from ticket import bulk, refdata
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.validators import UniqueValidator
@@ -97,7 +98,70 @@ class TicketPostSerializer(serializers.ModelSerializer):
         return value
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    ``?fields=id,title`` limits the output to the named fields and
+    ``?expand=posts`` opts into the heavy fields listed in
+    ``expandable_fields``. Views may pass ``default_expand`` in the
+    serializer context for requests that send no ``expand`` parameter.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        expand = request.query_params.get('expand')
+        if expand is None:
+            expanded = set(self.context.get('default_expand', ()))
+        else:
+            expanded = {name for name in expand.split(',') if name}
+        for name in self.expandable_fields:
+            if name not in expanded:
+                self.fields.pop(name, None)
+
+        fields = request.query_params.get('fields')
+        if fields:
+            allowed = {name for name in fields.split(',') if name}
+            for name in set(self.fields) - allowed:
+                self.fields.pop(name)
+
+
+class TicketListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Flat ticket representation for listings: ids, display names and activity."""
+    created_by_name = serializers.CharField(
+        source='created_by.username', read_only=True, default=None)
+    assigned_name = serializers.CharField(
+        source='assigned.username', read_only=True, default=None)
+    status_name = serializers.CharField(
+        source='status.status', read_only=True, default=None)
+    department_name = serializers.CharField(
+        source='department.department', read_only=True, default=None)
+    type_name = serializers.CharField(
+        source='type.type', read_only=True, default=None)
+    priority_display = serializers.CharField(
+        source='get_priority_display', read_only=True)
+    last_activity = serializers.DateTimeField(source='last_post_at', read_only=True)
+
+    class Meta:
+        model = Ticket
+        fields = [
+            'id', 'title', 'created_by', 'created_by_name', 'type', 'type_name',
+            'department', 'department_name', 'status', 'status_name',
+            'priority', 'priority_display', 'assigned', 'assigned_name',
+            'sentiment', 'post_count', 'follower_count', 'last_activity',
+            'updated', 'created'
+        ]
+        read_only_fields = ['created_by', 'type', 'department', 'status',
+                            'priority', 'assigned', 'sentiment', 'post_count',
+                            'follower_count']
+
+
+class TicketSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    expandable_fields = ('posts', 'followers')
+
     created_by = UserSerializer(read_only=True)
     assigned = UserSerializer(read_only=True)
     status = StatusSerializer(read_only=True)
@@ -128,7 +192,7 @@ class TicketCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = self.context['request'].user
 
-        open_status = Status.objects.get(status="Open")
+        open_status = refdata.get_status("Open")
 
         ticket = Ticket.objects.create(
             created_by=user,
@@ -136,3 +200,42 @@ class TicketCreateSerializer(serializers.ModelSerializer):
             **validated_data
         )
         return ticket
+
+
+class TicketBulkActionSerializer(serializers.Serializer):
+    """Request body for /api/tickets/bulk/"""
+    action = serializers.ChoiceField(choices=bulk.ACTIONS)
+    tickets = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False)
+    user = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(), required=False,
+        help_text="Assignee for the assign action (defaults to the current user)")
+    department = serializers.IntegerField(
+        required=False, help_text="Department ID for the transfer action")
+    status = serializers.IntegerField(
+        required=False, help_text="Status ID for the status action")
+
+    def validate_tickets(self, value):
+        if len(set(value)) > bulk.max_tickets():
+            raise serializers.ValidationError(
+                f"At most {bulk.max_tickets()} tickets can be updated at once.")
+        return value
+
+    def validate(self, attrs):
+        action = attrs['action']
+        if action == 'assign':
+            attrs['target'] = attrs.get('user')
+        elif action in ('transfer', 'status'):
+            field, model = {
+                'transfer': ('department', Department),
+                'status': ('status', Status),
+            }[action]
+            if attrs.get(field) is None:
+                raise serializers.ValidationError(
+                    {field: f"This field is required for the {action} action."})
+            try:
+                attrs['target'] = refdata.get(model, attrs[field])
+            except model.DoesNotExist:
+                raise serializers.ValidationError(
+                    {field: f"Invalid {field} ID."})
+        return attrs
@@ -1,3 +1,187 @@
+from datetime import timedelta
+from urllib.parse import urlsplit
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ticket.models import Ticket, TicketPost
+from ticket.tests import QueryBudgetMixin, TicketFixtureMixin
+
+
+class TicketApiQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_list(self):
+        self.assertQueryBudget("/api/tickets/", 4)
+
+    def test_retrieve(self):
+        ticket = self.make_ticket(posts=1)
+
+        def grow():
+            for n in range(15):
+                TicketPost.objects.create(ticket=ticket, user=self.alice, message=f"More {n}")
+            ticket.followers.add(self.alice, self.bob)
+
+        self.assertQueryBudget(f"/api/tickets/{ticket.pk}/", 7, grow=grow)
+
+
+class TicketPostsApiTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+        self.ticket = self.make_ticket(posts=7)
+        self.other = self.make_ticket("Other")
+        # Four posts share one timestamp, so pages have to break ties on id.
+        base = timezone.now() - timedelta(hours=1)
+        stamps = [base] + [base + timedelta(minutes=1)] * 4 + [base + timedelta(minutes=2)] * 2
+        for post, stamp in zip(self.ticket.posts.order_by("id"), stamps):
+            TicketPost.objects.filter(pk=post.pk).update(created=stamp)
+        self.expected = list(self.ticket.posts.order_by("created", "id").values_list("pk", flat=True))
+        self.url = f"/api/tickets/{self.ticket.pk}/posts/"
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_oldest_first(self):
+        seen = []
+        data = self.get(self.url, {"page_size": 3})
+        while True:
+            seen += [post["id"] for post in data["results"]]
+            if not data["next"]:
+                break
+            next_url = urlsplit(data["next"])
+            data = self.get(f"{next_url.path}?{next_url.query}")
+        self.assertEqual(seen, self.expected)
+
+    def test_since_returns_newer_posts(self):
+        for index in (0, 2, 6):
+            with self.subTest(since=index):
+                data = self.get(self.url, {"since": self.expected[index]})
+                self.assertEqual([post["id"] for post in data["results"]],
+                                 self.expected[index + 1:])
+
+    def test_bad_since(self):
+        foreign = self.other.posts.get().pk
+        for since in ("abc", "-1", foreign, 999999):
+            with self.subTest(since=since):
+                response = self.client.get(self.url, {"since": since})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/tickets/999999/posts/").status_code, 404)
+
+
+class SparseFieldsetTests(TicketFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.bob)
+        self.ticket = self.make_ticket(posts=2, followers=[self.alice])
+        self.detail = f"/api/tickets/{self.ticket.pk}/"
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_list_is_flat_and_detail_is_nested(self):
+        row = self.get("/api/tickets/")["results"][0]
+        self.assertEqual(row["id"], self.ticket.pk)
+        self.assertEqual((row["created_by"], row["created_by_name"]), (self.alice.pk, "alice"))
+        self.assertEqual((row["status"], row["status_name"]), (self.open.pk, "Open"))
+        self.assertEqual((row["post_count"], row["follower_count"]), (2, 1))
+        self.assertNotIn("posts", row)
+
+        detail = self.get(self.detail)
+        self.assertEqual(detail["created_by"]["username"], "alice")
+        self.assertEqual(detail["status"], {"id": self.open.pk, "status": "Open"})
+        self.assertEqual(len(detail["posts"]), 2)
+        self.assertEqual([user["username"] for user in detail["followers"]], ["alice"])
+
+    def test_fields(self):
+        row = self.get("/api/tickets/", fields="id,title")["results"][0]
+        self.assertEqual(set(row), {"id", "title"})
+        self.assertEqual(set(self.get(self.detail, fields="id,status")), {"id", "status"})
+
+    def test_unknown_fields_are_ignored(self):
+        row = self.get("/api/tickets/", fields="id,nope,,password")["results"][0]
+        self.assertEqual(set(row), {"id"})
+
+    def test_expand(self):
+        # The detail view expands everything unless the client narrows it.
+        self.assertNotIn("followers", self.get(self.detail, expand="posts"))
+        self.assertIn("posts", self.get(self.detail, expand="posts"))
+        self.assertFalse({"posts", "followers"} & set(self.get(self.detail, expand="")))
+        self.assertEqual(set(self.get(self.detail, expand="posts,nope", fields="id,posts")),
+                         {"id", "posts"})
+
+
+class AsyncTicketApiTests(TicketFixtureMixin, TestCase):
+    """The /api/async/ views answer like their TicketViewSet counterparts."""
+
+    def setUp(self):
+        super().setUp()
+        self.ticket = self.make_ticket(assigned=None)
+        token = RefreshToken.for_user(self.bob).access_token
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def url(self, suffix=""):
+        return f"/api/async/tickets/{self.ticket.pk}/{suffix}"
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get("/api/async/tickets/")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+        response = await self.async_client.post(self.url("assign_to_me/"))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_reads_match_sync_api(self):
+        for path in ("tickets/", f"tickets/{self.ticket.pk}/"):
+            with self.subTest(path=path):
+                response = await self.async_client.get(f"/api/async/{path}", headers=self.headers)
+                expected = await self.async_client.get(f"/api/{path}", headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+                self.assertEqual(response["ETag"], expected["ETag"])
+                response = await self.async_client.get(f"/api/async/{path}", headers={
+                    **self.headers, "If-None-Match": response["ETag"]})
+                self.assertEqual(response.status_code, 304)
+
+    async def test_add_post(self):
+        response = await self.async_client.post(
+            self.url("add_post/"), {"message": "Async reply"}, headers=self.headers)
+        self.assertEqual(response.status_code, 201, response.content)
+        post = await TicketPost.objects.select_related("user").aget(message="Async reply")
+        self.assertEqual((post.ticket_id, post.user), (self.ticket.pk, self.bob))
+
+        response = await self.async_client.post(self.url("add_post/"), {}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_assign_to_me(self):
+        response = await self.async_client.post(self.url("assign_to_me/"), headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        ticket = await Ticket.objects.aget(pk=self.ticket.pk)
+        self.assertEqual(ticket.assigned_id, self.bob.pk)
+
+    async def test_change_status(self):
+        response = await self.async_client.post(
+            self.url("change_status/"), {"status": self.closed.pk}, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        ticket = await Ticket.objects.aget(pk=self.ticket.pk)
+        self.assertEqual(ticket.status_id, self.closed.pk)
+
+        for data, code in (({}, 400), ({"status": 999}, 404)):
+            with self.subTest(data=data):
+                response = await self.async_client.post(
+                    self.url("change_status/"), data, headers=self.headers)
+                self.assertEqual(response.status_code, code)
 
-# Create your tests here.
+    async def test_missing_ticket(self):
+        self.ticket.pk = 999999
+        for suffix in ("", "add_post/", "assign_to_me/"):
+            method = self.async_client.get if not suffix else self.async_client.post
+            with self.subTest(suffix=suffix):
+                response = await method(self.url(suffix), headers=self.headers)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response["Content-Type"], "application/json")
@@ -9,7 +9,7 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'tickets', views.TicketViewSet)
@@ -17,8 +17,20 @@ router.register(r'statuses', views.StatusViewSet)
 router.register(r'departments', views.DepartmentViewSet)
 router.register(r'types', views.TicketTypeViewSet)
 
+# Async variants of the hot TicketViewSet actions; see async_views.
+async_urlpatterns = [
+    path('tickets/', async_views.ticket_list, name='async-ticket-list'),
+    path('tickets/<int:pk>/', async_views.ticket_detail, name='async-ticket-detail'),
+    path('tickets/<int:pk>/add_post/', async_views.add_post, name='async-ticket-add-post'),
+    path('tickets/<int:pk>/assign_to_me/', async_views.assign_to_me,
+         name='async-ticket-assign-to-me'),
+    path('tickets/<int:pk>/change_status/', async_views.change_status,
+         name='async-ticket-change-status'),
+]
+
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/', include(async_urlpatterns)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('register/', views.RegisterView.as_view(), name='auth_register'),
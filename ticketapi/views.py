@@ -5,11 +5,15 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from ticket.models import Ticket, TicketPost, Status, Department, TicketType
 from .serializers import (
-    TicketSerializer, TicketCreateSerializer, TicketPostSerializer,
+    TicketSerializer, TicketListSerializer, TicketCreateSerializer, TicketPostSerializer,
+    TicketBulkActionSerializer,
     StatusSerializer, DepartmentSerializer, TicketTypeSerializer,
     RegisterSerializer, UserSerializer
 )
 from ticket.utils import send_ticket_update_notification
+from ticket import bulk, conditional, refdata, search, services
+from ticket.pagination import keyset_filter
+from .pagination import PostCursorPagination, TicketCursorPagination
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
@@ -33,15 +37,122 @@ class UserDetailView(generics.RetrieveAPIView):
 class TicketViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Ticket.objects.all()
+    pagination_class = TicketCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'search'):
+            return queryset.for_list()
+        if self.action == 'retrieve':
+            return queryset.select_related(
+                'created_by', 'assigned', 'status', 'department', 'type'
+            ).prefetch_related('posts__user', 'followers')
+        if self.action == 'posts':
+            return queryset.only('id')
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'create':
             return TicketCreateSerializer
+        if self.action in ('list', 'search'):
+            return TicketListSerializer
         return TicketSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action not in ('list', 'search'):
+            # Detail responses keep their nested posts/followers unless the
+            # client narrows them with ?expand=.
+            context['default_expand'] = TicketSerializer.expandable_fields
+        return context
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('total'):
+            # The approximate total is not covered by the page probe.
+            return super().list(request, *args, **kwargs)
+
+        rows = self.paginator.probe(
+            conditional.with_probe(self.filter_queryset(self.get_queryset())),
+            request, conditional.PROBE_FIELDS)
+        etag = conditional.etag(rows, request.accepted_renderer.format)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+        response = super().list(request, *args, **kwargs)
+        return conditional.set_etag(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        row = conditional.probe_ticket(kwargs.get(self.lookup_field))
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = conditional.etag([row], request.accepted_renderer.format)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+        response = super().retrieve(request, *args, **kwargs)
+        return conditional.set_etag(response, etag)
+
     def perform_create(self, serializer):
         serializer.save()
 
+    @extend_schema(
+        description="Full-text search over ticket titles and post messages, best match first",
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Search text"
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                location=OpenApiParameter.QUERY,
+                description="Maximum number of results (default 25, max 100)"
+            )
+        ],
+        responses={200: TicketListSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search"""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 25)), 1), 100)
+        except ValueError:
+            limit = 25
+
+        ranked = search.search(request.query_params.get('q', ''), limit=limit)
+        tickets = self.get_queryset().in_bulk([pk for pk, _ in ranked])
+
+        results = []
+        for pk, score in ranked:
+            if pk in tickets:
+                data = self.get_serializer(tickets[pk]).data
+                data['rank'] = score
+                results.append(data)
+        return Response({'results': results})
+
+    @extend_schema(
+        description=("Assign, transfer, change the status of, follow or unfollow "
+                     "many tickets in one transaction. Affected users receive one "
+                     "batched notification."),
+        request=TicketBulkActionSerializer,
+        responses={200: None}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_update(self, request):
+        """Apply one action to a list of tickets"""
+        serializer = TicketBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            changed = bulk.apply(
+                request.user, data['action'], data['tickets'], data.get('target'))
+        except bulk.BulkActionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'updated': changed, 'count': len(changed)})
+
     @extend_schema(
         description="Assign the ticket to the current user",
         responses={200: None}
@@ -50,8 +161,7 @@ class TicketViewSet(viewsets.ModelViewSet):
     def assign_to_me(self, request, pk=None):
         """Assign the ticket to the current user"""
         ticket = self.get_object()
-        ticket.assigned = request.user
-        ticket.save()
+        services.assign_ticket(ticket.pk, request.user)
         return Response({'status': 'Ticket assigned successfully'})
 
     @extend_schema(
@@ -77,9 +187,8 @@ class TicketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        new_status = get_object_or_404(Status, id=status_id)
-        ticket.status = new_status
-        ticket.save()
+        new_status = refdata.get_or_404(Status, status_id)
+        services.change_status(ticket.pk, new_status)
         return Response({'status': f'Ticket status changed to {new_status.status}'})
 
     @extend_schema(
@@ -105,9 +214,8 @@ class TicketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        new_department = get_object_or_404(Department, id=department_id)
-        ticket.department = new_department
-        ticket.save()
+        new_department = refdata.get_or_404(Department, department_id)
+        services.transfer_ticket(ticket.pk, new_department)
         return Response({'status': f'Ticket transferred to {new_department.department}'})
 
     @extend_schema(
@@ -118,17 +226,47 @@ class TicketViewSet(viewsets.ModelViewSet):
     def toggle_follow(self, request, pk=None):
         """Toggle following status for the current user"""
         ticket = self.get_object()
-        user = request.user
-
-        if user in ticket.followers.all():
-            ticket.followers.remove(user)
-            action = 'unfollowed'
-        else:
-            ticket.followers.add(user)
-            action = 'followed'
+        action = 'followed' if services.toggle_follow(ticket, request.user) else 'unfollowed'
 
         return Response({'status': f'Successfully {action} the ticket'})
 
+    @extend_schema(
+        description=("Posts of the ticket, oldest first, with cursor pagination. "
+                     "Polling clients pass the id of the newest post they hold as "
+                     "`since` to receive only posts created after it."),
+        parameters=[
+            OpenApiParameter(
+                name="since",
+                type=int,
+                location=OpenApiParameter.QUERY,
+                description="Only return posts created after this post ID"
+            )
+        ],
+        responses={200: TicketPostSerializer(many=True)}
+    )
+    @action(detail=True, methods=['get'], pagination_class=PostCursorPagination)
+    def posts(self, request, pk=None):
+        """Paginated thread, or the posts added since a known post"""
+        ticket = self.get_object()
+        posts = TicketPost.objects.filter(ticket=ticket).select_related('user')
+
+        since = request.query_params.get('since')
+        if since:
+            anchor = None
+            if since.isdigit():
+                anchor = posts.filter(pk=since).values_list('created', flat=True).first()
+            if anchor is None:
+                return Response(
+                    {'error': 'since must be the ID of a post on this ticket'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            posts = posts.filter(
+                keyset_filter(('created', 'id'), (anchor, int(since)), descending=False))
+
+        page = self.paginate_queryset(posts)
+        serializer = TicketPostSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
     @extend_schema(
         description="Add a new post/comment to the ticket",
         responses={201: TicketPostSerializer},
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "ticket.middleware.InstrumentationMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -65,7 +66,7 @@ ROOT_URLCONF = "ticketsystem.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "ticket.instrumentation.InstrumentedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -187,6 +188,24 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Caches
+# The default cache is local to each process. Caches that are invalidated
+# from signals (notification recipients, ...) must be shared by every
+# process serving requests, or the other processes keep serving stale
+# entries until they expire: set SHARED_CACHE_URL (redis://..., requires
+# the redis package) when running more than one process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if os.environ.get('SHARED_CACHE_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['SHARED_CACHE_URL'],
+    }
+SHARED_CACHE_ALIAS = 'shared' if 'shared' in CACHES else 'default'
+
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -196,6 +215,73 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Updates to the same ticket within this many seconds are sent as one digest.
+NOTIFICATION_DIGEST_WINDOW = int(os.environ.get('NOTIFICATION_DIGEST_WINDOW', 60))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 5))
+# Cached recipient sets are dropped on follower/assignment changes; the TTL
+# bounds staleness after a user changes their email address.
+NOTIFICATION_RECIPIENT_TTL = int(os.environ.get('NOTIFICATION_RECIPIENT_TTL', 3600))
+NOTIFICATION_CACHE_ALIAS = os.environ.get('NOTIFICATION_CACHE_ALIAS', SHARED_CACHE_ALIAS)
+
+# "My tickets" tab badges are cached per user and dropped when the user's
+# created/assigned/followed tickets change; the TTL is a safety net.
+DASHBOARD_COUNTS_TTL = int(os.environ.get('DASHBOARD_COUNTS_TTL', 300))
+DASHBOARD_CACHE_ALIAS = os.environ.get('DASHBOARD_CACHE_ALIAS', SHARED_CACHE_ALIAS)
+
+# Upper bound on tickets touched by one bulk triage action (HTML and API).
+BULK_MAX_TICKETS = int(os.environ.get('BULK_MAX_TICKETS', 500))
+
+# Real-time ticket events (ticket.realtime), served by ticketsystem.asgi.
+# The in-memory layer only reaches sockets in the same process; set
+# REALTIME_REDIS_URL when running several processes or nodes.
+REALTIME_CHANNEL_LAYER = {
+    'BACKEND': 'ticket.realtime.InMemoryChannelLayer',
+    'OPTIONS': {},
+}
+if os.environ.get('REALTIME_REDIS_URL'):
+    REALTIME_CHANNEL_LAYER = {
+        'BACKEND': 'ticket.realtime.RedisChannelLayer',
+        'OPTIONS': {'url': os.environ['REALTIME_REDIS_URL']},
+    }
+
+# Sentiment analysis
+# Load the VADER lexicon at startup instead of on the first scored post.
+SENTIMENT_PRELOAD = int(os.environ.get('SENTIMENT_PRELOAD', 0))
+SENTIMENT_CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 1024))
+
+# Background tasks are stored in the database and run by `manage.py run_workers`.
+# Set TICKET_TASKS_EAGER to run them inline instead (no worker needed).
+TICKET_TASKS_EAGER = int(os.environ.get('TICKET_TASKS_EAGER', 0))
+
+# Status/Department/TicketType rows are cached in each process. Their version
+# lives in REFDATA_CACHE_ALIAS (the shared cache when SHARED_CACHE_URL is
+# set) so invalidations reach every worker. Without it each process reloads
+# them every REFDATA_CACHE_TTL seconds to pick up changes made elsewhere.
+REFDATA_CACHE_ENABLED = int(os.environ.get('REFDATA_CACHE_ENABLED', 1))
+REFDATA_CACHE_ALIAS = os.environ.get('REFDATA_CACHE_ALIAS') or (
+    'shared' if 'shared' in CACHES else None)
+REFDATA_CACHE_TTL = int(os.environ.get('REFDATA_CACHE_TTL', 60))
+
+# Full-text search returns at most this many ranked tickets per query.
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))
+
+# Dotted paths to callables receiving (name, seconds, labels) timings.
+TICKET_METRICS_HOOKS = [
+    'ticket.metrics.log_hook',
+    'ticket.instrumentation.record_span',
+]
+
+# Fraction of requests that record query/template/span timings and feed
+# /metrics. 0 disables request instrumentation.
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 0.1))
+# Send a Server-Timing header on sampled responses to staff users (to every
+# client when DEBUG is on).
+INSTRUMENTATION_SERVER_TIMING = int(os.environ.get('INSTRUMENTATION_SERVER_TIMING', 1))
+# Space separated client IPs allowed to scrape /metrics; staff users may
+# always read it. Defaults to loopback only.
+INSTRUMENTATION_METRICS_ALLOWED_IPS = os.environ.get(
+    'INSTRUMENTATION_METRICS_ALLOWED_IPS', '127.0.0.1 ::1').split()
+
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Ticket System API',
@@ -18,9 +18,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from ticket.instrumentation import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('ticket.urls')),
     path('api/', include('ticketapi.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)